@@ -0,0 +1,143 @@
+import csv
+import io
+from typing import Iterable, Iterator
+from aledger.domain.models import ExportFormat, Transaction
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+# One row per journal entry, alongside the transaction it was posted with.
+JOURNAL_COLUMNS = (
+    "transaction_id",
+    "transaction_name",
+    "posted_at",
+    "entry_id",
+    "account_id",
+    "direction",
+    "amount",
+)
+
+
+def columnar_formats_available() -> bool:
+    return pyarrow is not None
+
+
+def resolve_format(requested: ExportFormat) -> ExportFormat:
+    """Falls back to CSV when the columnar formats can't be written."""
+    if requested != ExportFormat.CSV and not columnar_formats_available():
+        return ExportFormat.CSV
+    return requested
+
+
+def journal_batches(
+    transactions: Iterable[Transaction], batch_size: int
+) -> Iterator[dict[str, list]]:
+    """Flattens transactions into column batches of at most batch_size journal entries."""
+    batch: dict[str, list] = {column: [] for column in JOURNAL_COLUMNS}
+    rows = 0
+    for txn in transactions:
+        for entry in txn.entries:
+            batch["transaction_id"].append(str(txn.id))
+            batch["transaction_name"].append(txn.name)
+            batch["posted_at"].append(txn.posted_at)
+            batch["entry_id"].append(str(entry.id))
+            batch["account_id"].append(str(entry.account_id))
+            batch["direction"].append(entry.direction.value)
+            batch["amount"].append(entry.amount)
+            rows += 1
+            if rows == batch_size:
+                yield batch
+                batch = {column: [] for column in JOURNAL_COLUMNS}
+                rows = 0
+    if rows:
+        yield batch
+
+
+def export_journal(
+    transactions: Iterable[Transaction], format: ExportFormat, batch_size: int
+) -> Iterator[bytes]:
+    """Encodes the journal in the given format, yielding one chunk of bytes per batch."""
+    batches = journal_batches(transactions, batch_size)
+    if format == ExportFormat.CSV:
+        return _export_csv(batches)
+    return _export_columnar(batches, format)
+
+
+def _export_csv(batches: Iterator[dict[str, list]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(JOURNAL_COLUMNS)
+    for batch in batches:
+        writer.writerows(zip(*[batch[column] for column in JOURNAL_COLUMNS]))
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+class _ChunkSink:
+    """Write-only file object whose contents are drained after every batch."""
+
+    def __init__(self) -> None:
+        self.chunks: list[bytes] = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _journal_schema():
+    return pyarrow.schema(
+        [
+            ("transaction_id", pyarrow.string()),
+            ("transaction_name", pyarrow.string()),
+            ("posted_at", pyarrow.timestamp("us", tz="UTC")),
+            ("entry_id", pyarrow.string()),
+            ("account_id", pyarrow.string()),
+            ("direction", pyarrow.dictionary(pyarrow.int8(), pyarrow.string())),
+            ("amount", pyarrow.int64()),
+        ]
+    )
+
+
+def _export_columnar(batches: Iterator[dict[str, list]], format: ExportFormat) -> Iterator[bytes]:
+    schema = _journal_schema()
+    sink = _ChunkSink()
+    if format == ExportFormat.PARQUET:
+        writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    else:
+        writer = pyarrow.ipc.new_stream(sink, schema)
+
+    for batch in batches:
+        record_batch = pyarrow.RecordBatch.from_pydict(batch, schema=schema)
+        if format == ExportFormat.PARQUET:
+            # ParquetWriter only takes tables in pyarrow 6.
+            writer.write_table(pyarrow.Table.from_batches([record_batch]))
+        else:
+            writer.write_batch(record_batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
@@ -1,5 +1,15 @@
+import contextlib
+import itertools
+import os
+import tempfile
+import threading
 import uuid
-from aledger.domain.models import Transaction, Account
+from datetime import datetime
+from typing import Iterator, NamedTuple, Optional
+from aledger.domain.models import Transaction, Account, AccountEntry, TurnoverBucket
+from aledger.adapters.segments import ColdSegment
+from aledger.adapters.turnover import TurnoverIndex
+from aledger.settings import SETTINGS
 from aledger.exceptions import (
     TransactionAlreadyExists,
     AccountNotFound,
@@ -9,23 +19,71 @@ from aledger.exceptions import (
 )
 
 
+class BalanceSnapshot(NamedTuple):
+    account: Account
+    entries: list[AccountEntry]
+    entry_count: int
+    opening_balance: int
+    balance: int
+
+
 class InMemoryTransactionRepository:
 
     _data: list[Transaction] = []
     _ids: set[uuid.UUID] = set()
+    _lock = threading.Lock()
+    # Bumped whenever the transactions list is replaced, which shifts stored positions.
+    generation = 0
 
     def add(self, txn: Transaction) -> None:
-        # Prevent claimed transaction ids from being reused.
-        if txn.id in self._ids:
-            raise TransactionAlreadyExists(txn.id)
+        with self._lock:
+            # Prevent claimed transaction ids from being reused.
+            if txn.id in self._ids:
+                raise TransactionAlreadyExists(txn.id)
 
-        # Update main repository and indexes.
-        self._data.append(txn)
-        self._ids.add(txn.id)
+            # Update main repository and indexes.
+            self._data.append(txn)
+            self._ids.add(txn.id)
+
+    def closed_before(self, cutoff: datetime) -> list[Transaction]:
+        """Returns the transactions dated before the cutoff, in storage order."""
+        return [txn for txn in self.snapshot() if txn.posted_at < cutoff]
+
+    def discard(self, txn_ids: set[uuid.UUID]) -> None:
+        """Drops transactions from memory, e.g. once they are moved to a cold segment.
+
+        Their ids stay claimed. The list is replaced rather than edited, so snapshots taken
+        earlier keep reading the list they started on.
+        """
+        with self._lock:
+            self._data = [txn for txn in self._data if txn.id not in txn_ids]
+            self.generation += 1
+
+    def snapshot(self) -> Iterator[Transaction]:
+        """Iterates over the transactions stored up to now, unaffected by later additions.
+
+        Transactions are only appended to the list, so the length at the start delimits a
+        consistent snapshot without holding back concurrent postings.
+        """
+        data = self._data
+        size = len(data)
+        return (data[position] for position in range(size))
+
+    def window(self, start: int, stop: int) -> list[Transaction]:
+        """Returns the transactions stored between two positions, in storage order."""
+        return self._data[start:stop]
+
+    def exists(self, txn_id: uuid.UUID) -> bool:
+        return txn_id in self._ids
+
+    def __len__(self) -> int:
+        return len(self._data)
 
     def clear(self) -> None:
-        self._data = []
-        self._ids = set()
+        with self._lock:
+            self._data = []
+            self._ids = set()
+            self.generation += 1
 
 
 class InMemoryAccountRepository:
@@ -33,6 +91,14 @@ class InMemoryAccountRepository:
     _data: dict[uuid.UUID, Account] = {}
     _entry_ids: set[uuid.UUID] = set()
     _acc_names: set[str] = set()
+    _turnover: dict[uuid.UUID, list[TurnoverIndex]] = {}
+    _slot_locks: dict[uuid.UUID, list[threading.Lock]] = {}
+    _slot_cursor = itertools.count()
+    _entry_id_locks = [threading.Lock() for _ in range(64)]
+    _close_lock = threading.Lock()
+    _segments: list[ColdSegment] = []
+    _segments_dir: Optional[str] = None
+    closed_through: Optional[datetime] = None
 
     def add(self, account: Account) -> None:
         # Prevent claimed account ids from being reused.
@@ -41,7 +107,7 @@ class InMemoryAccountRepository:
 
         # Prevent repeated entries from being added.
         set_entry_ids = set([entry.id for entry in account.entries])
-        repeated_entry_ids = set_entry_ids & self._entry_ids
+        repeated_entry_ids = self._claimed_entry_ids(set_entry_ids)
         if repeated_entry_ids:
             raise AccountEntryAlreadyExists(repeated_entry_ids)
 
@@ -53,6 +119,10 @@ class InMemoryAccountRepository:
         self._data[account.id] = account
         self._entry_ids.update(set_entry_ids)
         self._acc_names.add(account.name)
+        self._turnover[account.id] = [TurnoverIndex() for _ in account.slots]
+        for entry in account.entries:
+            self._turnover[account.id][0].add(entry)
+        self._slot_locks[account.id] = [threading.Lock() for _ in account.slots]
 
     def update(self, account: Account) -> None:
         current_account = self.get(account.id)
@@ -61,7 +131,7 @@ class InMemoryAccountRepository:
         set_entry_ids = set([entry.id for entry in account.entries])
         old_entry_ids = set([entry.id for entry in current_account.entries])
         new_entry_ids = set_entry_ids - old_entry_ids
-        repeated_entry_ids = new_entry_ids & self._entry_ids
+        repeated_entry_ids = self._claimed_entry_ids(new_entry_ids)
         if repeated_entry_ids:
             raise AccountEntryAlreadyExists(repeated_entry_ids)
 
@@ -70,10 +140,192 @@ class InMemoryAccountRepository:
             if account.name in self._acc_names:
                 raise AccountNameAlreadyExists(account.name)
 
-        # Update main repository and indexes.
-        self._acc_names.add(account.name)
-        self._entry_ids.update(set_entry_ids)
-        self._data[account.id] = account
+        # Update main repository and indexes, keeping concurrent postings out meanwhile.
+        with self._all_slots_locked(account.id):
+            self._acc_names.add(account.name)
+            self._entry_ids.update(set_entry_ids)
+            self._data[account.id] = account
+            if len(account.slots) != len(self._slot_locks[account.id]):
+                self._slot_locks[account.id] = [threading.Lock() for _ in account.slots]
+                self._add_turnover_slots(account.id, len(account.slots))
+        for entry in account.entries:
+            if entry.id in new_entry_ids:
+                self._turnover[account.id][0].add(entry)
+
+    def post_entry(self, entry: AccountEntry) -> None:
+        """Appends an entry to its account without copying or replacing the account record.
+
+        Only the lock of one balance slot is held while the entry is applied, and each slot
+        keeps its own turnover index, so postings to a hot account configured with several
+        slots don't wait on each other. Entry ids are claimed under one of several locks,
+        picked by id, so postings to different accounts don't wait on each other either.
+
+        The bookkeeping itself is Python code and runs under the interpreter lock: slots
+        remove the waiting on a held lock (e.g. on storage writes), not the cost of the
+        posting, and throughput past one core calls for several processes.
+        """
+        if not self.exists(entry.account_id):
+            raise AccountNotFound()
+
+        # Prevent repeated entries from being added.
+        with self._entry_id_locks[entry.id.int % len(self._entry_id_locks)]:
+            if self._claimed_entry_ids({entry.id}):
+                raise AccountEntryAlreadyExists({entry.id})
+            self._entry_ids.add(entry.id)
+
+        # Apply the entry to the next slot in a round-robin fashion.
+        while True:
+            slot_locks = self._slot_locks[entry.account_id]
+            slot = next(self._slot_cursor) % len(slot_locks)
+            with slot_locks[slot]:
+                # The slot layout may have been changed while waiting for the lock.
+                if slot_locks is not self._slot_locks[entry.account_id]:
+                    continue
+                self._apply_entry(self._data[entry.account_id], slot, entry)
+                break
+
+        self._turnover[entry.account_id][slot].add(entry)
+
+    def set_slots(self, account_id: uuid.UUID, count: int) -> None:
+        """Changes the number of balance slots of an account, preserving its balance."""
+        if not self.exists(account_id):
+            raise AccountNotFound()
+
+        with self._all_slots_locked(account_id):
+            account = self._data[account_id]
+            slots = account.slots[:count] + [0] * (count - len(account.slots))
+            slots[0] += sum(account.slots[count:])
+            account.slots = slots
+            self._slot_locks[account_id] = [threading.Lock() for _ in range(count)]
+            self._add_turnover_slots(account_id, count)
+
+    def close_period(
+        self, cutoff: datetime, transactions: Optional[InMemoryTransactionRepository] = None
+    ) -> int:
+        """Moves the entries posted before the cutoff out of the live accounts.
+
+        Closed entries are written to an immutable cold segment, along with the entries of the
+        previously closed periods, and their balance is carried forward as the opening balance
+        of each account. Closed entry ids stay claimed through the segment, so they can't be
+        reused. The transactions dated before the cutoff, when given, are moved to the segment
+        as well. Nothing changes if the segment can't be written.
+
+        Returns:
+            int: the number of entries moved to the cold segment.
+        """
+        # Closes are serialized, so none of them drops or deletes a segment another one wrote.
+        with self._close_lock:
+            return self._close_period(cutoff, transactions)
+
+    def _close_period(
+        self, cutoff: datetime, transactions: Optional[InMemoryTransactionRepository]
+    ) -> int:
+        # Collects the entries to close, without holding postings back while writing.
+        closing = []
+        for account_id in list(self._data):
+            with self._all_slots_locked(account_id):
+                entries = self._data[account_id].entries
+                closing.extend([entry for entry in entries if self._is_closed(entry, cutoff)])
+
+        closing_txns = transactions.closed_before(cutoff) if transactions else []
+
+        # Previous segments are merged into the new one, so there is only ever one to search.
+        if closing or closing_txns:
+            merged = list(self._segments)
+            path = self._next_segment_path()
+            segment = ColdSegment.write(path, closing, base=merged, transactions=closing_txns)
+            self._segments = [segment]
+            for previous in merged:
+                previous.unlink()
+
+        # Postings dated before the cutoff are refused from now on.
+        self.closed_through = max(cutoff, self.closed_through or cutoff)
+        if transactions and closing_txns:
+            transactions.discard(set([txn.id for txn in closing_txns]))
+        if not closing:
+            return 0
+
+        # Entry ids are claimed by both the segment and the live accounts for a moment.
+        closed_ids = set([entry.id for entry in closing])
+        for account_id in set([entry.account_id for entry in closing]):
+            with self._all_slots_locked(account_id):
+                account = self._data[account_id]
+                closed = [entry for entry in account.entries if entry.id in closed_ids]
+                account.entries = [entry for entry in account.entries if entry.id not in closed_ids]
+                account.opening_balance += sum([account.signed_amount(entry) for entry in closed])
+        with self._all_entry_ids_locked():
+            self._entry_ids -= closed_ids
+
+        return len(closing)
+
+    def iter_entries(self, account_id: uuid.UUID, start: int = 0) -> Iterator[AccountEntry]:
+        """Iterates over the full history of an account, from closed periods onwards.
+
+        The history is captured when called, skipping the given number of entries, and closed
+        entries are read from the cold segments as the iteration goes.
+        """
+        if not self.exists(account_id):
+            raise AccountNotFound()
+        with self._close_lock, self._all_slots_locked(account_id):
+            segments = list(self._segments)
+            live = self._data[account_id].entries
+            live_count = len(live)
+
+        history = []
+        for segment in segments:
+            count = segment.count_entries(account_id)
+            if start < count:
+                history.append(segment.entries(account_id, start))
+            start = max(0, start - count)
+        history.append(itertools.islice(live, start, live_count))
+        return itertools.chain(*history)
+
+    def journal(self, transactions: InMemoryTransactionRepository) -> Iterator[Transaction]:
+        """Iterates over every transaction, from closed periods onwards.
+
+        The journal is captured when called, and closed transactions are read from the cold
+        segments as the iteration goes.
+        """
+        with self._close_lock:
+            segments = list(self._segments)
+            live = transactions.snapshot()
+        return itertools.chain(*[segment.transactions() for segment in segments], live)
+
+    def balance_snapshot(self, account_id: uuid.UUID) -> Optional["BalanceSnapshot"]:
+        """Captures the balance of an account along with the live entries that make it up.
+
+        Nothing is copied, so this is cheap enough to call while postings go on. The entries
+        list is the live one: only its first `entry_count` entries are part of the snapshot.
+        """
+        if not self.exists(account_id):
+            return None
+        with self._all_slots_locked(account_id):
+            account = self._data[account_id]
+            return BalanceSnapshot(
+                account=account,
+                entries=account.entries,
+                entry_count=len(account.entries),
+                opening_balance=account.opening_balance,
+                balance=account.balance,
+            )
+
+    def is_entry_claimed(self, entry_id: uuid.UUID) -> bool:
+        return bool(self._claimed_entry_ids({entry_id}))
+
+    def is_entry_closed(self, entry_id: uuid.UUID) -> bool:
+        return any([entry_id in segment for segment in list(self._segments)])
+
+    def count_indexed_entries(self) -> int:
+        """Counts the ids of the live entries, as indexed."""
+        return len(self._entry_ids)
+
+    def indexed_entry_ids(self) -> list[uuid.UUID]:
+        """Copies the ids of the live entries, as indexed, holding postings back meanwhile."""
+        with self._all_entry_ids_locked():
+            return list(self._entry_ids)
+
+    def account_ids(self) -> list[uuid.UUID]:
+        return list(self._data)
 
     def get(self, account_id: uuid.UUID) -> Account:
         record = self._data.get(account_id)
@@ -81,13 +333,96 @@ class InMemoryAccountRepository:
             raise AccountNotFound()
         return record and record.copy(deep=True)
 
+    def turnover_report(
+        self, account_id: uuid.UUID, bucket: TurnoverBucket, start: int, end: int
+    ) -> list[tuple[int, int]]:
+        """Reports the (debit, credit) turnover of every bucket in the absolute range [start, end).
+
+        Each balance slot keeps its own turnover index, the report adds their reports up.
+        """
+        indexes = self._turnover.get(account_id)
+        if indexes is None:
+            raise AccountNotFound()
+        report = [(0, 0)] * (end - start)
+        for index in list(indexes):
+            report = [
+                (debit + slot_debit, credit + slot_credit)
+                for (debit, credit), (slot_debit, slot_credit) in zip(
+                    report, index.report(bucket, start, end)
+                )
+            ]
+        return report
+
     def exists(self, account_id: uuid.UUID) -> bool:
         return account_id in self._data
 
+    def count_entries(self, account_id: uuid.UUID) -> int:
+        """Counts the live entries of an account, without copying the account record."""
+        record = self._data.get(account_id)
+        return len(record.entries) if record else 0
+
     def clear(self) -> None:
         self._data = {}
         self._acc_names = set()
         self._entry_ids = set()
+        self._turnover = {}
+        self._slot_locks = {}
+        with self._close_lock:
+            for segment in self._segments:
+                segment.delete()
+            self._segments = []
+            self.closed_through = None
+
+    def _claimed_entry_ids(self, entry_ids: set[uuid.UUID]) -> set[uuid.UUID]:
+        claimed = entry_ids & self._entry_ids
+        for segment in self._segments:
+            claimed.update([entry_id for entry_id in entry_ids if entry_id in segment])
+        return claimed
+
+    @staticmethod
+    def _is_closed(entry: AccountEntry, cutoff: datetime) -> bool:
+        return entry.posted_at is not None and entry.posted_at < cutoff
+
+    def _next_segment_path(self) -> str:
+        if not self._segments_dir:
+            self._segments_dir = str(
+                SETTINGS.segments_dir or tempfile.mkdtemp(prefix="aledger-segments-")
+            )
+        name = f"segment-{uuid.uuid4().hex}"
+        return os.path.join(self._segments_dir, name)
+
+    def _add_turnover_slots(self, account_id: uuid.UUID, count: int) -> None:
+        # Indexes are only ever added, those of removed slots keep their past postings.
+        indexes = self._turnover[account_id]
+        indexes.extend([TurnoverIndex() for _ in range(count - len(indexes))])
+
+    def _apply_entry(self, account: Account, slot: int, entry: AccountEntry) -> None:
+        account.apply_entry(entry, slot=slot)
+
+    @contextlib.contextmanager
+    def _all_entry_ids_locked(self) -> Iterator[None]:
+        with contextlib.ExitStack() as stack:
+            for lock in self._entry_id_locks:
+                stack.enter_context(lock)
+            yield
+
+    @contextlib.contextmanager
+    def _all_slots_locked(self, account_id: uuid.UUID) -> Iterator[None]:
+        while True:
+            slot_locks = self._slot_locks[account_id]
+            for lock in slot_locks:
+                lock.acquire()
+
+            # The slot layout may have been changed while waiting for the locks.
+            if slot_locks is self._slot_locks[account_id]:
+                break
+            for lock in slot_locks:
+                lock.release()
+        try:
+            yield
+        finally:
+            for lock in slot_locks:
+                lock.release()
 
 
 # NOTE: temporary in-memory storage.
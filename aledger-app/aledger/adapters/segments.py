@@ -0,0 +1,269 @@
+import bisect
+import heapq
+import mmap
+import os
+import struct
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import BinaryIO, Iterable, Iterator, Sequence, Union
+from aledger.domain.models import AccountEntry, Direction, Transaction
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# id, account_id, direction, amount, posted_at (microseconds since the epoch)
+RECORD = struct.Struct("<16s16sBQq")
+ID_SIZE = 16
+
+# id, posted_at (microseconds since the epoch), entry count, name size; followed by the utf-8
+# name and by one record per entry.
+TRANSACTION = struct.Struct("<16sqHH")
+
+# Bytes copied at once from a base segment journal.
+COPY_SIZE = 1 << 20
+
+SUFFIXES = (".entries", ".ids", ".journal")
+
+DIRECTION_CODES = {Direction.CREDIT: 0, Direction.DEBIT: 1}
+DIRECTIONS = {code: direction for direction, code in DIRECTION_CODES.items()}
+
+
+class BloomFilter:
+    """Compact set membership test with false positives but no false negatives."""
+
+    HASHES = 7
+
+    def __init__(self, capacity: int, bits_per_item: int = 10) -> None:
+        self.size = max(64, capacity * bits_per_item)
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def add(self, item: uuid.UUID) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item: uuid.UUID) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item)
+        )
+
+    def _positions(self, item: uuid.UUID) -> Iterator[int]:
+        # Double hashing over the two halves of the (mostly random) uuid bits.
+        value = item.int
+        first, second = value & 0xFFFFFFFFFFFFFFFF, (value >> 64) | 1
+        for i in range(self.HASHES):
+            yield (first + i * second) % self.size
+
+
+# Memory map of a segment file, or empty bytes for an empty file, which can't be mapped.
+Buffer = Union[mmap.mmap, bytes]
+
+
+class SortedIdIndex(Sequence):
+    """Read-only view of the sorted 16 byte entry ids stored in a memory-mapped file."""
+
+    def __init__(self, data: Buffer) -> None:
+        self._data = data
+
+    def __len__(self) -> int:
+        return len(self._data) // ID_SIZE
+
+    def __getitem__(self, index):  # type: ignore
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        start = index * ID_SIZE
+        return self._data[start : start + ID_SIZE]  # noqa: E203
+
+
+class ColdSegment:
+    """Immutable on-disk set of closed account entries and transactions, read through memory maps.
+
+    Entries are grouped by account, in posting order. A companion file holds the sorted entry
+    ids, searched in logarithmic time once the in-memory Bloom filter can't rule an id out, and
+    a journal file holds the closed transactions along with their entries, in posting order.
+
+    Segments can be written on top of older ones, which keeps the number of segments (and so
+    the cost of checking an entry id against all of them) from growing with every close.
+    """
+
+    def __init__(self, path: str, accounts: dict[uuid.UUID, tuple[int, int]], ids: BloomFilter):
+        self.path = path
+        self._accounts = accounts
+        self._bloom = ids
+        self._entries_file = open(f"{path}.entries", "rb")
+        self._ids_file = open(f"{path}.ids", "rb")
+        self._journal_file = open(f"{path}.journal", "rb")
+        self._entries = _map(self._entries_file)
+        self._ids = _map(self._ids_file)
+        self._journal = _map(self._journal_file)
+        self._id_index = SortedIdIndex(self._ids)
+
+    @classmethod
+    def write(
+        cls,
+        path: str,
+        entries: Iterable[AccountEntry],
+        base: Sequence["ColdSegment"] = (),
+        transactions: Iterable[Transaction] = (),
+    ) -> "ColdSegment":
+        """Writes a segment holding the entries and transactions of the base segments followed
+        by new ones.
+
+        The records of the base segments are copied over as they are. Partially written files
+        are removed when writing fails.
+        """
+        by_account: dict[uuid.UUID, list[bytes]] = {}
+        new_ids = []
+        for entry in entries:
+            by_account.setdefault(entry.account_id, []).append(encode(entry))
+            new_ids.append(entry.id.bytes)
+        new_ids.sort()
+
+        try:
+            accounts = cls._write_entries(f"{path}.entries", by_account, base)
+            bloom = cls._write_ids(f"{path}.ids", new_ids, base)
+            cls._write_journal(f"{path}.journal", transactions, base)
+        except BaseException:
+            for suffix in SUFFIXES:
+                if os.path.exists(f"{path}{suffix}"):
+                    os.remove(f"{path}{suffix}")
+            raise
+
+        return cls(path, accounts, bloom)
+
+    @staticmethod
+    def _write_entries(
+        path: str, by_account: dict[uuid.UUID, list[bytes]], base: Sequence["ColdSegment"]
+    ) -> dict[uuid.UUID, tuple[int, int]]:
+        account_ids = [account_id for segment in base for account_id in segment._accounts]
+        account_ids = list(dict.fromkeys(account_ids + list(by_account)))
+        accounts = {}
+        with open(path, "wb") as entries_file:
+            position = 0
+            for account_id in account_ids:
+                count = 0
+                for segment in base:
+                    first, size = segment._accounts.get(account_id, (0, 0))
+                    entries_file.write(segment._records(first, size))
+                    count += size
+                for record in by_account.get(account_id, []):
+                    entries_file.write(record)
+                    count += 1
+                accounts[account_id] = (position, count)
+                position += count
+        return accounts
+
+    @staticmethod
+    def _write_ids(path: str, new_ids: list[bytes], base: Sequence["ColdSegment"]) -> BloomFilter:
+        bloom = BloomFilter(len(new_ids) + sum([len(segment) for segment in base]))
+        with open(path, "wb") as ids_file:
+            for entry_id in heapq.merge(new_ids, *[segment._id_index for segment in base]):
+                ids_file.write(entry_id)
+                bloom.add(uuid.UUID(bytes=entry_id))
+        return bloom
+
+    @staticmethod
+    def _write_journal(
+        path: str, transactions: Iterable[Transaction], base: Sequence["ColdSegment"]
+    ) -> None:
+        with open(path, "wb") as journal_file:
+            for segment in base:
+                for offset in range(0, len(segment._journal), COPY_SIZE):
+                    journal_file.write(segment._journal[offset : offset + COPY_SIZE])  # noqa: E203
+            for txn in transactions:
+                journal_file.write(encode_transaction(txn))
+
+    def __len__(self) -> int:
+        return len(self._id_index)
+
+    def __contains__(self, entry_id: uuid.UUID) -> bool:
+        if entry_id not in self._bloom:
+            return False
+        position = bisect.bisect_left(self._id_index, entry_id.bytes)
+        return position < len(self._id_index) and self._id_index[position] == entry_id.bytes
+
+    def _records(self, first: int, count: int) -> bytes:
+        return self._entries[first * RECORD.size : (first + count) * RECORD.size]  # noqa: E203
+
+    def count_entries(self, account_id: uuid.UUID) -> int:
+        return self._accounts.get(account_id, (0, 0))[1]
+
+    def entries(self, account_id: uuid.UUID, start: int = 0) -> Iterator[AccountEntry]:
+        """Iterates over the entries of an account, skipping the given number of them."""
+        first, count = self._accounts.get(account_id, (0, 0))
+        for position in range(first + start, first + count):
+            yield decode(self._entries, position * RECORD.size)
+
+    def transactions(self) -> Iterator[Transaction]:
+        """Iterates over the closed transactions, in posting order."""
+        offset = 0
+        while offset < len(self._journal):
+            txn, offset = decode_transaction(self._journal, offset)
+            yield txn
+
+    def close(self) -> None:
+        for buffer in (self._entries, self._ids, self._journal):
+            if isinstance(buffer, mmap.mmap):
+                buffer.close()
+        self._entries_file.close()
+        self._ids_file.close()
+        self._journal_file.close()
+
+    def delete(self) -> None:
+        self.close()
+        self.unlink()
+
+    def unlink(self) -> None:
+        # Open memory maps stay readable, so concurrent readers can finish with the segment.
+        for suffix in SUFFIXES:
+            os.remove(f"{self.path}{suffix}")
+
+
+def _map(file: BinaryIO) -> Buffer:
+    if not os.fstat(file.fileno()).st_size:
+        return b""
+    return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def encode(entry: AccountEntry) -> bytes:
+    posted_at = (entry.posted_at - EPOCH) // timedelta(microseconds=1)  # type: ignore
+    return RECORD.pack(
+        entry.id.bytes,
+        entry.account_id.bytes,
+        DIRECTION_CODES[entry.direction],
+        entry.amount,
+        posted_at,
+    )
+
+
+def decode(buffer: Buffer, offset: int) -> AccountEntry:
+    id, account_id, direction, amount, posted_at = RECORD.unpack_from(buffer, offset)
+    return AccountEntry.construct(
+        id=uuid.UUID(bytes=id),
+        account_id=uuid.UUID(bytes=account_id),
+        direction=DIRECTIONS[direction],
+        amount=amount,
+        posted_at=EPOCH + timedelta(microseconds=posted_at),
+    )
+
+
+def encode_transaction(txn: Transaction) -> bytes:
+    posted_at = (txn.posted_at - EPOCH) // timedelta(microseconds=1)
+    name = str(txn.name).encode()
+    header = TRANSACTION.pack(txn.id.bytes, posted_at, len(txn.entries), len(name))
+    return b"".join([header, name] + [encode(entry) for entry in txn.entries])
+
+
+def decode_transaction(buffer: Buffer, offset: int) -> tuple[Transaction, int]:
+    """Decodes the transaction stored at the offset, along with the offset of the next one."""
+    id, posted_at, count, name_size = TRANSACTION.unpack_from(buffer, offset)
+    offset += TRANSACTION.size
+    name = bytes(buffer[offset : offset + name_size]).decode()  # noqa: E203
+    offset += name_size
+    entries = [decode(buffer, offset + position * RECORD.size) for position in range(count)]
+    txn = Transaction.construct(
+        id=uuid.UUID(bytes=id),
+        name=name,
+        posted_at=EPOCH + timedelta(microseconds=posted_at),
+        entries=entries,
+    )
+    return txn, offset + count * RECORD.size
@@ -0,0 +1,164 @@
+import bisect
+import calendar
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from aledger.domain.models import AccountEntry, Direction, TurnoverBucket, as_utc
+
+
+class FenwickTree:
+    """Binary indexed tree over a growable array of integer bucket totals.
+
+    Point updates and prefix sums are both O(log n). The tree grows on demand (by doubling)
+    so that buckets can be appended without knowing the length of the history upfront.
+    """
+
+    def __init__(self, size: int = 16) -> None:
+        self._values = [0] * size
+        self._tree = [0] * (size + 1)
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def add(self, index: int, value: int) -> None:
+        if index >= len(self._values):
+            self._resize(max(index + 1, 2 * len(self._values)))
+        self._values[index] += value
+        i = index + 1
+        while i < len(self._tree):
+            self._tree[i] += value
+            i += i & -i
+
+    def insert(self, index: int) -> None:
+        """Inserts an empty bucket before the given index, shifting later buckets right."""
+        values = self._values[:index] + [0] + self._values[index:]
+        self._resize(len(values), values=values)
+
+    def prefix_sum(self, index: int) -> int:
+        """Sums buckets in the range [0, index)."""
+        total = 0
+        i = min(index, len(self._values))
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def range_sum(self, start: int, end: int) -> int:
+        """Sums buckets in the range [start, end)."""
+        if end <= start:
+            return 0
+        return self.prefix_sum(end) - self.prefix_sum(max(start, 0))
+
+    def _resize(self, size: int, values: Optional[list[int]] = None) -> None:
+        values = list(self._values) if values is None else values
+        values.extend([0] * (size - len(values)))
+
+        # Rebuilds the tree in linear time from the raw bucket values.
+        tree = [0] + values
+        for i in range(1, len(tree)):
+            parent = i + (i & -i)
+            if parent < len(tree):
+                tree[parent] += tree[i]
+
+        self._values = values
+        self._tree = tree
+
+
+def bucket_index(moment: datetime, bucket: TurnoverBucket) -> int:
+    """Maps a point in time to the absolute index of the bucket that contains it."""
+    moment = as_utc(moment).astimezone(timezone.utc)  # type: ignore
+    if bucket == TurnoverBucket.MONTH:
+        return moment.year * 12 + moment.month - 1
+    seconds = calendar.timegm(moment.utctimetuple())
+    if bucket == TurnoverBucket.DAY:
+        return seconds // 86400
+    return seconds // 3600
+
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+END_OF_TIME = datetime.max.replace(tzinfo=timezone.utc)
+
+
+def bucket_start(index: int, bucket: TurnoverBucket) -> datetime:
+    """Maps an absolute bucket index back to the point in time where the bucket starts.
+
+    Buckets starting past the last representable datetime are clamped to it.
+    """
+    try:
+        if bucket == TurnoverBucket.MONTH:
+            return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+        if bucket == TurnoverBucket.DAY:
+            return EPOCH + timedelta(days=index)
+        return EPOCH + timedelta(hours=index)
+    except (OverflowError, ValueError):
+        return END_OF_TIME
+
+
+class TurnoverIndex:
+    """Per-account debit/credit totals, bucketed by hour, day and month.
+
+    Only buckets with postings are stored: each bucket size keeps the sorted absolute indexes
+    of its buckets, and the trees are laid out over positions in that list. Sparse storage
+    keeps a posting dated far away from the others from allocating every bucket in between.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._keys: dict[TurnoverBucket, list[int]] = {bucket: [] for bucket in TurnoverBucket}
+        self._trees: dict[tuple[TurnoverBucket, Direction], FenwickTree] = {
+            (bucket, direction): FenwickTree()
+            for bucket in TurnoverBucket
+            for direction in Direction
+        }
+
+    def bucket_count(self) -> int:
+        """Counts the stored buckets, over every bucket size."""
+        return sum([len(keys) for keys in self._keys.values()])
+
+    def add(self, entry: AccountEntry) -> None:
+        if entry.posted_at is None:
+            return
+        with self._lock:
+            self._add(entry)
+
+    def _add(self, entry: AccountEntry) -> None:
+        for bucket in TurnoverBucket:
+            index = bucket_index(entry.posted_at, bucket)  # type: ignore
+            keys = self._keys[bucket]
+            position = bisect.bisect_left(keys, index)
+            if position == len(keys) or keys[position] != index:
+                keys.insert(position, index)
+                # Postings usually land in the last bucket, only backdated ones shift others.
+                if position < len(keys) - 1:
+                    for direction in Direction:
+                        self._trees[(bucket, direction)].insert(position)
+
+            self._trees[(bucket, entry.direction)].add(position, entry.amount)
+
+    def sum(self, bucket: TurnoverBucket, direction: Direction, start: int, end: int) -> int:
+        """Sums the turnover of the absolute bucket range [start, end)."""
+        with self._lock:
+            keys = self._keys[bucket]
+            first = bisect.bisect_left(keys, start)
+            last = bisect.bisect_left(keys, end)
+            return self._trees[(bucket, direction)].range_sum(first, last)
+
+    def report(self, bucket: TurnoverBucket, start: int, end: int) -> list[tuple[int, int]]:
+        """Reports the (debit, credit) turnover of every bucket in the absolute range [start, end).
+
+        All buckets are read under a single hold of the lock, so the report is consistent
+        with itself even while postings are being added.
+        """
+        report = [(0, 0)] * (end - start)
+        debits = self._trees[(bucket, Direction.DEBIT)]
+        credits = self._trees[(bucket, Direction.CREDIT)]
+        with self._lock:
+            keys = self._keys[bucket]
+            first = bisect.bisect_left(keys, start)
+            last = bisect.bisect_left(keys, end)
+            for position in range(first, last):
+                report[keys[position] - start] = (
+                    debits.range_sum(position, position + 1),
+                    credits.range_sum(position, position + 1),
+                )
+        return report
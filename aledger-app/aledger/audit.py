@@ -0,0 +1,444 @@
+import collections
+import enum
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Optional
+from pydantic import BaseModel
+from aledger.adapters.repositories import (
+    ACCOUNTS_REPOSITORY,
+    TRANSACTIONS_REPOSITORY,
+    BalanceSnapshot,
+    InMemoryAccountRepository,
+    InMemoryTransactionRepository,
+)
+from aledger.domain.models import Account, AccountEntry, Direction, Transaction, utcnow
+from aledger.metrics import METRICS
+
+
+DISCREPANCIES = METRICS.counter(
+    "aledger_audit_discrepancies_total", "Ledger inconsistencies found by the auditor."
+)
+VERIFIED = METRICS.counter("aledger_audit_verified_total", "Records verified by the auditor.")
+PASSES = METRICS.counter("aledger_audit_passes_total", "Audit passes over the whole ledger.")
+LAG = METRICS.gauge(
+    "aledger_audit_lag_seconds", "Age of the oldest ledger changes that may not be verified."
+)
+
+# Where a verified entry was found: in a stored transaction, in an account, or both.
+POSTED = 1
+FILED = 2
+
+
+class DiscrepancyKind(enum.Enum):
+    UNBALANCED_TRANSACTION = "unbalanced_transaction"
+    UNINDEXED_TRANSACTION = "unindexed_transaction"
+    BALANCE_MISMATCH = "balance_mismatch"
+    UNINDEXED_ENTRY = "unindexed_entry"
+    MISPLACED_ENTRY = "misplaced_entry"
+    UNPOSTED_ENTRY = "unposted_entry"
+    UNFILED_ENTRY = "unfiled_entry"
+    STALE_ENTRY_ID = "stale_entry_id"
+    UNBALANCED_LEDGER = "unbalanced_ledger"
+
+
+class Discrepancy(BaseModel):
+    kind: DiscrepancyKind
+    # Ledger-wide discrepancies have no subject.
+    subject_id: Optional[uuid.UUID] = None
+    detail: str
+    found_at: datetime
+
+
+class AuditStatus(BaseModel):
+    passes: int
+    lag_seconds: Optional[float]
+    last_pass_started_at: Optional[datetime]
+    last_pass_completed_at: Optional[datetime]
+    discrepancies: list[Discrepancy]
+
+
+class Checkpoint:
+    """Verified prefix of the entries list of an account, and the sums of its amounts."""
+
+    __slots__ = (
+        "entries",
+        "count",
+        "signed_sum",
+        "debits",
+        "credits",
+        "opening",
+        "reported_balance",
+    )
+
+    def __init__(self, entries: list[AccountEntry]) -> None:
+        self.entries = entries
+        self.count = 0
+        self.signed_sum = 0
+        self.debits = 0
+        self.credits = 0
+        # Opening balance as of the last snapshot, positive for a net debit.
+        self.opening = 0
+        self.reported_balance: Optional[int] = None
+
+
+class Auditor:
+    """Continuously verifies that the ledger is consistent, a little at a time.
+
+    Each pass checks that every transaction is balanced and indexed, that every live entry is
+    indexed and filed under its own account, and that the balance of every account matches
+    its opening balance plus its entries. Work is done in time-bounded slices, so the auditor
+    can run between postings without holding them back.
+
+    Entries are only ever appended to an account, so a checkpoint of the verified entries is
+    kept per account: later passes only verify the entries appended since, unless the entries
+    list was replaced (e.g. by an update or a period close), which triggers a full check.
+
+    At the end of each pass the ledger as a whole is checked: debits and credits must add up
+    to the same total over every account, every entry filed under an account must be part of
+    a stored transaction and the other way around, and every indexed entry id must belong to
+    a filed entry. To do so incrementally, the auditor remembers where each verified entry id
+    was found, which takes about as much memory as the entry id index of the repository.
+    """
+
+    # Records verified between deadline checks.
+    CHUNK = 256
+
+    # Seconds an entry may be filed under an account before its transaction is stored.
+    POSTING_GRACE = 5.0
+
+    def __init__(
+        self,
+        accounts: InMemoryAccountRepository,
+        transactions: InMemoryTransactionRepository,
+    ) -> None:
+        self.accounts = accounts
+        self.transactions = transactions
+        self.discrepancies: collections.deque[Discrepancy] = collections.deque(maxlen=100)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.passes = 0
+            self.last_pass_started_at: Optional[datetime] = None
+            self.last_pass_completed_at: Optional[datetime] = None
+            self.discrepancies.clear()
+            self._pending: collections.deque[uuid.UUID] = collections.deque()
+            self._current: Optional[BalanceSnapshot] = None
+            self._pass_started: Optional[float] = None
+            self._verified_through: Optional[float] = None
+            self._restart_cross_checks()
+
+    def lag(self) -> Optional[float]:
+        """Seconds since the start of the last complete pass, all changes before it are verified."""
+        since = self._verified_through or self._pass_started
+        return None if since is None else time.monotonic() - since
+
+    def status(self) -> AuditStatus:
+        with self._lock:
+            return AuditStatus(
+                passes=self.passes,
+                lag_seconds=self.lag(),
+                last_pass_started_at=self.last_pass_started_at,
+                last_pass_completed_at=self.last_pass_completed_at,
+                discrepancies=list(self.discrepancies),
+            )
+
+    def run_slice(self, budget: float) -> bool:
+        """Verifies the ledger for about the given number of seconds, at least one chunk.
+
+        Returns:
+            bool: whether the slice completed an audit pass.
+        """
+        deadline = time.perf_counter() + budget
+        with self._lock:
+            if self._pass_started is None:
+                self._begin_pass()
+            completed = False
+            while True:
+                if not self._step():
+                    self._complete_pass()
+                    completed = True
+                    break
+                if time.perf_counter() >= deadline:
+                    break
+            lag = self.lag()
+            if lag is not None:
+                LAG.set(lag)
+            return completed
+
+    def start(
+        self,
+        slice_ms: float,
+        interval_ms: float,
+        max_lag: float,
+        is_idle: Callable[[], bool] = lambda: True,
+    ) -> None:
+        """Runs audit slices in a background thread while idle, or when too far behind."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run, args=(slice_ms, interval_ms, max_lag, is_idle), daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stopping.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+    def _run(
+        self, slice_ms: float, interval_ms: float, max_lag: float, is_idle: Callable[[], bool]
+    ) -> None:
+        while not self._stopping.wait(interval_ms / 1000):
+            if is_idle() or (self.lag() or 0) > max_lag:
+                self.run_slice(slice_ms / 1000)
+
+    def _restart_cross_checks(self) -> None:
+        # Forgets every verified record, so the whole ledger is verified again.
+        self._checkpoints: dict[uuid.UUID, Checkpoint] = {}
+        self._entry_flags: dict[uuid.UUID, int] = {}
+        self._unposted: dict[uuid.UUID, tuple[AccountEntry, float, int]] = {}
+        self._unfiled: set[uuid.UUID] = set()
+        self._reported_ids: set[uuid.UUID] = set()
+        self._reported_totals: Optional[tuple[int, int]] = None
+        self._index_counts: Optional[tuple[int, int]] = None
+        self._txn_generation = self.transactions.generation
+        self._txn_position = 0
+        self._txn_target = len(self.transactions)
+        self._current = None
+        self._ledger_verifiable = False
+
+    def _begin_pass(self) -> None:
+        self._pass_started = time.monotonic()
+        self.last_pass_started_at = utcnow()
+        if self._txn_generation != self.transactions.generation:
+            self._restart_cross_checks()
+        account_ids = self.accounts.account_ids()
+        for account_id in set(self._checkpoints) - set(account_ids):
+            self._drop_checkpoint(account_id)
+        self._pending = collections.deque(account_ids)
+        self._txn_target = len(self.transactions)
+        self._ledger_verifiable = True
+
+    def _complete_pass(self) -> None:
+        if self._ledger_verifiable:
+            self._verify_ledger()
+        self._verified_through = self._pass_started
+        self._pass_started = None
+        self.last_pass_completed_at = utcnow()
+        self.passes += 1
+        PASSES.inc()
+
+    def _step(self) -> bool:
+        # Verifies one chunk of work, returns False once the pass has nothing left to verify.
+        if self._txn_generation != self.transactions.generation:
+            # Transactions are only ever appended, unless the list is replaced (e.g. by a
+            # close), which shifts their positions: everything is verified again from scratch,
+            # and the ledger as a whole can't be verified before the next pass.
+            self._restart_cross_checks()
+        if self._txn_position < self._txn_target:
+            self._verify_transactions()
+            return True
+        if self._current is None:
+            self._current = self._next_account()
+            if self._current is None:
+                return False
+        self._verify_entries(self._current)
+        return True
+
+    def _next_account(self) -> Optional[BalanceSnapshot]:
+        while self._pending:
+            account_id = self._pending.popleft()
+            snapshot = self.accounts.balance_snapshot(account_id)
+            if snapshot is None:
+                self._drop_checkpoint(account_id)
+                continue
+
+            checkpoint = self._checkpoints.get(account_id)
+            if (
+                checkpoint is None
+                or checkpoint.entries is not snapshot.entries
+                or checkpoint.count > snapshot.entry_count
+            ):
+                self._drop_checkpoint(account_id)
+                checkpoint = self._checkpoints[account_id] = Checkpoint(snapshot.entries)
+            opening = snapshot.opening_balance
+            checkpoint.opening = (
+                opening if snapshot.account.direction == Direction.DEBIT else -opening
+            )
+            return snapshot
+        return None
+
+    def _drop_checkpoint(self, account_id: uuid.UUID) -> None:
+        checkpoint = self._checkpoints.pop(account_id, None)
+        if checkpoint is None:
+            return
+        for entry in checkpoint.entries[: checkpoint.count]:  # noqa: E203
+            flags = self._entry_flags.pop(entry.id, 0) & ~FILED
+            self._unposted.pop(entry.id, None)
+            if flags:
+                # Verified again along with the new entries list, unless it was dropped.
+                self._entry_flags[entry.id] = flags
+                self._unfiled.add(entry.id)
+
+    def _verify_transactions(self) -> None:
+        stop = min(self._txn_position + self.CHUNK, self._txn_target)
+        for txn in self.transactions.window(self._txn_position, stop):
+            if not txn.is_balanced:
+                self._report(
+                    DiscrepancyKind.UNBALANCED_TRANSACTION, txn.id, "debits and credits differ"
+                )
+            if not self.transactions.exists(txn.id):
+                self._report(
+                    DiscrepancyKind.UNINDEXED_TRANSACTION, txn.id, "transaction id is not indexed"
+                )
+            self._post(txn)
+        VERIFIED.inc(stop - self._txn_position, record="transaction")
+        self._txn_position = stop
+
+    def _post(self, txn: Transaction) -> None:
+        # Transactions of this pass were stored before it started, and so were their entries:
+        # the accounts verified later in the pass must hold every one of them.
+        for entry in txn.entries:
+            flags = self._entry_flags.get(entry.id, 0)
+            self._entry_flags[entry.id] = flags | POSTED
+            if flags & FILED:
+                self._unposted.pop(entry.id, None)
+            else:
+                self._unfiled.add(entry.id)
+
+    def _verify_entries(self, snapshot: BalanceSnapshot) -> None:
+        account = snapshot.account
+        checkpoint = self._checkpoints[account.id]
+        stop = min(checkpoint.count + self.CHUNK, snapshot.entry_count)
+        filed_at = time.monotonic()
+        for entry in snapshot.entries[checkpoint.count : stop]:  # noqa: E203
+            self._verify_entry(account, entry)
+            self._file(entry, filed_at)
+            checkpoint.signed_sum += account.signed_amount(entry)
+            if entry.direction == Direction.DEBIT:
+                checkpoint.debits += entry.amount
+            else:
+                checkpoint.credits += entry.amount
+        VERIFIED.inc(stop - checkpoint.count, record="entry")
+        checkpoint.count = stop
+        if stop < snapshot.entry_count:
+            return
+
+        # The account is verified up to the snapshot, so its balance can be checked.
+        self._current = None
+        expected = snapshot.opening_balance + checkpoint.signed_sum
+        if expected == snapshot.balance:
+            checkpoint.reported_balance = None
+        elif checkpoint.reported_balance != snapshot.balance:
+            # Reported once, not on every pass over an unchanged account.
+            checkpoint.reported_balance = snapshot.balance
+            self._report(
+                DiscrepancyKind.BALANCE_MISMATCH,
+                account.id,
+                f"balance is {snapshot.balance}, entries add up to {expected}",
+            )
+
+    def _verify_entry(self, account: Account, entry: AccountEntry) -> None:
+        if entry.account_id != account.id:
+            self._report(
+                DiscrepancyKind.MISPLACED_ENTRY,
+                entry.id,
+                f"entry of account {entry.account_id} filed under account {account.id}",
+            )
+        if not self.accounts.is_entry_claimed(entry.id):
+            self._report(DiscrepancyKind.UNINDEXED_ENTRY, entry.id, "entry id is not indexed")
+
+    def _file(self, entry: AccountEntry, filed_at: float) -> None:
+        flags = self._entry_flags.get(entry.id, 0)
+        self._entry_flags[entry.id] = flags | FILED
+        if flags & POSTED:
+            self._unfiled.discard(entry.id)
+        else:
+            # Entries are filed before their transaction is stored, which may then only be
+            # verified in the next pass.
+            self._unposted[entry.id] = (entry, filed_at, self.passes)
+
+    def _verify_ledger(self) -> None:
+        now = time.monotonic()
+        for entry_id, (_, filed_at, filed_in) in list(self._unposted.items()):
+            if filed_in < self.passes and now - filed_at >= self.POSTING_GRACE:
+                del self._unposted[entry_id]
+                self._report(
+                    DiscrepancyKind.UNPOSTED_ENTRY, entry_id, "entry is part of no transaction"
+                )
+
+        for entry_id in self._unfiled:
+            if not self.accounts.is_entry_closed(entry_id):
+                self._report(
+                    DiscrepancyKind.UNFILED_ENTRY, entry_id, "entry is filed under no account"
+                )
+        self._unfiled.clear()
+
+        self._verify_totals()
+        self._verify_entry_ids()
+
+    def _verify_totals(self) -> None:
+        debits = credits = 0
+        for checkpoint in self._checkpoints.values():
+            debits += checkpoint.debits + max(checkpoint.opening, 0)
+            credits += checkpoint.credits + max(-checkpoint.opening, 0)
+
+        # Entries still waiting for their transaction are left out, as the other entries of
+        # the transaction may not be filed yet.
+        for entry, _, _ in self._unposted.values():
+            if entry.direction == Direction.DEBIT:
+                debits -= entry.amount
+            else:
+                credits -= entry.amount
+
+        if debits == credits:
+            self._reported_totals = None
+        elif self._reported_totals != (debits, credits):
+            # Reported once, not on every pass over an unchanged ledger.
+            self._reported_totals = (debits, credits)
+            self._report(
+                DiscrepancyKind.UNBALANCED_LEDGER,
+                None,
+                f"debits add up to {debits}, credits to {credits}",
+            )
+
+    def _verify_entry_ids(self) -> None:
+        # Entry ids are indexed before their entries are filed, so a surplus of indexed ids is
+        # only looked into once it stays put from one pass to the next, i.e. nothing was posted.
+        indexed = self.accounts.count_indexed_entries()
+        filed = sum([checkpoint.count for checkpoint in self._checkpoints.values()])
+        stable = self._index_counts == (indexed, filed)
+        self._index_counts = (indexed, filed)
+        if indexed <= filed or not stable:
+            return
+
+        stale = [
+            entry_id
+            for entry_id in self.accounts.indexed_entry_ids()
+            if not self._entry_flags.get(entry_id, 0) & FILED
+        ]
+        if self.accounts.count_indexed_entries() != indexed:
+            return
+        for entry_id in stale:
+            if entry_id not in self._reported_ids:
+                self._reported_ids.add(entry_id)
+                self._report(
+                    DiscrepancyKind.STALE_ENTRY_ID, entry_id, "entry id is indexed, but no entry"
+                )
+
+    def _report(self, kind: DiscrepancyKind, subject_id: Optional[uuid.UUID], detail: str) -> None:
+        self.discrepancies.append(
+            Discrepancy(kind=kind, subject_id=subject_id, detail=detail, found_at=utcnow())
+        )
+        DISCREPANCIES.inc(kind=kind.value)
+
+
+AUDITOR = Auditor(ACCOUNTS_REPOSITORY, TRANSACTIONS_REPOSITORY)
@@ -0,0 +1,173 @@
+import asyncio
+import heapq
+import itertools
+import json
+import math
+from typing import Optional
+from starlette.types import ASGIApp, Receive, Scope, Send
+from aledger.controllers import codecs
+from aledger.metrics import METRICS
+from aledger.settings import SETTINGS
+
+
+IN_FLIGHT = METRICS.gauge("aledger_admission_in_flight", "Requests being served.")
+QUEUE_DEPTH = METRICS.gauge("aledger_admission_queue_depth", "Requests waiting for a turn.")
+ADMITTED = METRICS.counter("aledger_admission_admitted_total", "Requests admitted.")
+REJECTED = METRICS.counter("aledger_admission_rejected_total", "Requests shed under load.")
+
+
+class Rejected(Exception):
+    def __init__(self, status_code: int, reason: str, retry_after: int) -> None:
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionGate:
+    """Bounds the number of concurrent requests of a kind, and the number waiting for a turn.
+
+    Waiting requests are served by priority (lower first), then by arrival. A request that
+    finds the queue full is rejected straight away, and a request that waits longer than
+    the queue timeout is rejected instead of being served late.
+    """
+
+    def __init__(self, name: str, concurrency: int, queue_depth: int, queue_timeout: float):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue_depth = queue_depth
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.queued = 0
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+    async def acquire(self, priority: int = 0) -> None:
+        if self.in_flight < self.concurrency and not self.queued:
+            self._admit()
+            return
+
+        if self.queued >= self.queue_depth:
+            raise self._rejection(429, "queue_full")
+
+        # Waits for a turn, handed over by a finishing request, or for the deadline.
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        waiter.add_done_callback(self._dequeue)
+        heapq.heappush(self._waiters, (priority, next(self._sequence), waiter))
+        self.queued += 1
+        QUEUE_DEPTH.set(self.queued, gate=self.name)
+        deadline = loop.call_later(self.queue_timeout, self._expire, waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                self.release()
+            raise
+        finally:
+            deadline.cancel()
+
+    def release(self) -> None:
+        while self._waiters and self.in_flight <= self.concurrency:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                # Hands the turn over without letting it go, so in_flight is unchanged.
+                waiter.set_result(None)
+                ADMITTED.inc(gate=self.name)
+                return
+        self.in_flight -= 1
+        IN_FLIGHT.set(self.in_flight, gate=self.name)
+
+    def _admit(self) -> None:
+        self.in_flight += 1
+        IN_FLIGHT.set(self.in_flight, gate=self.name)
+        ADMITTED.inc(gate=self.name)
+
+    def _expire(self, waiter: asyncio.Future) -> None:
+        if not waiter.done():
+            waiter.set_exception(self._rejection(503, "queue_timeout"))
+
+    def _dequeue(self, waiter: asyncio.Future) -> None:
+        self.queued -= 1
+        QUEUE_DEPTH.set(self.queued, gate=self.name)
+
+    def _rejection(self, status_code: int, reason: str) -> Rejected:
+        REJECTED.inc(gate=self.name, reason=reason)
+        return Rejected(status_code, reason, retry_after=max(1, math.ceil(self.queue_timeout)))
+
+
+READ_GATE = AdmissionGate(
+    "read",
+    concurrency=SETTINGS.read_concurrency,
+    queue_depth=SETTINGS.read_queue_depth,
+    queue_timeout=SETTINGS.queue_timeout,
+)
+WRITE_GATE = AdmissionGate(
+    "write",
+    concurrency=SETTINGS.write_concurrency,
+    queue_depth=SETTINGS.write_queue_depth,
+    queue_timeout=SETTINGS.queue_timeout,
+)
+
+# Operational endpoints are never shed, they are needed the most while under load.
+EXEMPT_PATHS = ("/metrics", "/admin", "/docs", "/redoc", "/openapi.json")
+
+
+class AdmissionMiddleware:
+    """ASGI middleware that admits HTTP requests through the read and write gates.
+
+    Reads and postings never wait on each other. Among postings, small transactions (by
+    request body size) are served ahead of large ones.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"].startswith(EXEMPT_PATHS):
+            await self.app(scope, receive, send)
+            return
+
+        gate, priority = self.classify(scope)
+        try:
+            await gate.acquire(priority)
+        except Rejected as rejection:
+            await self.reject(scope, send, rejection)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
+
+    def classify(self, scope: Scope) -> tuple[AdmissionGate, int]:
+        if scope["method"] in ("GET", "HEAD"):
+            return READ_GATE, 0
+        content_length = self.header(scope, b"content-length")
+        if content_length and content_length.isdigit():
+            if int(content_length) > SETTINGS.small_transaction_bytes:
+                return WRITE_GATE, 1
+        return WRITE_GATE, 0
+
+    async def reject(self, scope: Scope, send: Send, rejection: Rejected) -> None:
+        content = {"error": "error.overloaded", "detail": rejection.reason}
+        if codecs.prefers_msgpack(self.header(scope, b"accept")):
+            media_type, body = codecs.MSGPACK_MEDIA_TYPES[0], codecs.pack(content)
+        else:
+            media_type, body = codecs.JSON_MEDIA_TYPE, json.dumps(content).encode()
+        headers = [
+            (b"content-type", media_type.encode()),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(rejection.retry_after).encode()),
+        ]
+        await send(
+            {"type": "http.response.start", "status": rejection.status_code, "headers": headers}
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    @staticmethod
+    def header(scope: Scope, name: bytes) -> Optional[str]:
+        for key, value in scope["headers"]:
+            if key == name:
+                return value.decode("latin-1")
+        return None
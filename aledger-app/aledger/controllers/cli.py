@@ -0,0 +1,50 @@
+"""Command line interface to the HTTP API.
+
+Usage:
+    python -m aledger.controllers.cli export --format parquet --output journal.parquet
+"""
+import argparse
+import shutil
+import sys
+import urllib.parse
+import urllib.request
+from aledger.domain import ExportFormat
+from aledger.settings import SETTINGS
+
+
+def export(args: argparse.Namespace) -> int:
+    query = urllib.parse.urlencode({"format": args.format, "batch_size": args.batch_size})
+    request = urllib.request.Request(
+        f"{args.url.rstrip('/')}/admin/export/journal?{query}",
+        headers={"x-admin-token": args.token or ""},
+    )
+    with urllib.request.urlopen(request) as response:
+        content_type = response.headers.get("content-type", "")
+        with open(args.output, "wb") as output:
+            # Copies the stream in chunks, the journal may not fit in memory.
+            shutil.copyfileobj(response, output, length=1024 * 1024)
+    print(f"journal exported to {args.output} ({content_type})", file=sys.stderr)
+    return 0
+
+
+def main(argv=None) -> int:
+    admin_token = SETTINGS.admin_token.get_secret_value() if SETTINGS.admin_token else None
+    parser = argparse.ArgumentParser(prog="aledger")
+    parser.add_argument("--url", default=SETTINGS.api_url)
+    parser.add_argument("--token", default=admin_token, help="defaults to ALEDGER_ADMIN_TOKEN")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="export the journal to a file")
+    export_parser.add_argument(
+        "--format", choices=[format.value for format in ExportFormat], default="parquet"
+    )
+    export_parser.add_argument("--batch-size", type=int, default=10000)
+    export_parser.add_argument("--output", required=True)
+    export_parser.set_defaults(handler=export)
+
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,74 @@
+import enum
+import uuid
+from typing import Any, Optional
+import msgpack  # type: ignore
+from pydantic import BaseModel
+from aledger.domain import Direction
+
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack")
+
+# Directions travel as small integers rather than as their string values.
+DIRECTION_CODES = {Direction.CREDIT: 0, Direction.DEBIT: 1}
+DIRECTIONS = {code: direction.value for direction, code in DIRECTION_CODES.items()}
+
+# Fields holding UUIDs, which travel as 16 raw bytes.
+UUID_FIELDS = ("id", "account_id")
+
+
+def is_msgpack(media_type: Optional[str]) -> bool:
+    if not media_type:
+        return False
+    return media_type.split(";")[0].strip().lower() in MSGPACK_MEDIA_TYPES
+
+
+def prefers_msgpack(accept: Optional[str]) -> bool:
+    """Tells whether an Accept header ranks MessagePack above JSON."""
+    best_quality, best_is_msgpack = 0.0, False
+    for media_range in (accept or "").split(","):
+        media_type, *params = [part.strip() for part in media_range.split(";")]
+        quality = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        if quality > best_quality and (is_msgpack(media_type) or media_type == JSON_MEDIA_TYPE):
+            best_quality, best_is_msgpack = quality, is_msgpack(media_type)
+    return best_is_msgpack
+
+
+def pack(content: Any) -> bytes:
+    """Encodes content as MessagePack, with UUIDs as 16 raw bytes and directions as ints."""
+    return msgpack.packb(content, default=_encode, datetime=True)
+
+
+def unpack(data: bytes) -> Any:
+    """Decodes MessagePack content into the same shapes a JSON body would produce."""
+    return msgpack.unpackb(data, object_hook=_decode, timestamp=3)
+
+
+def _encode(obj: Any) -> Any:
+    if isinstance(obj, uuid.UUID):
+        return obj.bytes
+    if isinstance(obj, Direction):
+        return DIRECTION_CODES[obj]
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    if isinstance(obj, BaseModel):
+        return obj.dict()
+    if isinstance(obj, int):
+        # MessagePack hands over the integers it can't encode.
+        raise OverflowError(f"integer {obj} does not fit in 64 bits")
+    raise TypeError(f"cannot encode object of type {type(obj).__name__}")
+
+
+def _decode(obj: dict) -> dict:
+    for key, value in obj.items():
+        if key in UUID_FIELDS and isinstance(value, bytes) and len(value) == 16:
+            obj[key] = uuid.UUID(bytes=value)
+        elif key == "direction" and isinstance(value, int):
+            obj[key] = DIRECTIONS.get(value, value)
+    return obj
@@ -1,14 +1,94 @@
+import secrets
 import uuid
-from fastapi import FastAPI, HTTPException, status
+from datetime import datetime
+from typing import Any, Callable
+from fastapi import APIRouter, Body, Depends, FastAPI, Header, HTTPException, Query, Request
+from fastapi import Response, status
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.encoders import jsonable_encoder
+from fastapi.routing import APIRoute
+from aledger.controllers import codecs
+from aledger.audit import AUDITOR, AuditStatus
+from aledger.controllers.admission import WRITE_GATE, AdmissionMiddleware
+from aledger.metrics import METRICS
+from aledger.profiling import PROFILER, ProfilerSettings, SlowCall
+from aledger.settings import SETTINGS
 from aledger.domain import models
 from aledger.domain import commands
 import aledger.exceptions
 import aledger.service
 
+
+# -------------------------------------------------------------------------------------
+# Content Negotiation
+# -------------------------------------------------------------------------------------
+
+
+class MsgPackRequest(Request):
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = codecs.unpack(await self.body())
+        return self._json
+
+
+class MsgPackResponse(Response):
+    media_type = codecs.MSGPACK_MEDIA_TYPES[0]
+
+    def render(self, content: Any) -> bytes:
+        return codecs.pack(content)
+
+
+class NegotiatedRoute(APIRoute):
+    """Route that accepts MessagePack request bodies besides JSON ones."""
+
+    def get_route_handler(self) -> Callable:
+        route_handler = super().get_route_handler()
+
+        async def negotiated_route_handler(request: Request) -> Response:
+            if codecs.is_msgpack(request.headers.get("content-type")):
+                # FastAPI parses bodies lacking a content type through Request.json().
+                scope = dict(request.scope)
+                scope["headers"] = [
+                    (name, value) for name, value in scope["headers"] if name != b"content-type"
+                ]
+                request = MsgPackRequest(scope, request.receive)
+            return await route_handler(request)
+
+        return negotiated_route_handler
+
+
+def negotiate(request: Request, content: Any, status_code: int = status.HTTP_200_OK) -> Any:
+    if codecs.prefers_msgpack(request.headers.get("accept")):
+        try:
+            return MsgPackResponse(content, status_code=status_code)
+        except OverflowError:
+            # Integers beyond 64 bits (e.g. a balance adding up huge amounts) are sent as JSON.
+            pass
+    if status_code != status.HTTP_200_OK:
+        return JSONResponse(content, status_code=status_code)
+    return content
+
+
 app = FastAPI()
+app.router.route_class = NegotiatedRoute
+app.add_middleware(AdmissionMiddleware)
+
+
+@app.on_event("startup")
+def start_auditor():
+    if SETTINGS.audit_enabled:
+        AUDITOR.start(
+            slice_ms=SETTINGS.audit_slice_ms,
+            interval_ms=SETTINGS.audit_interval_ms,
+            max_lag=SETTINGS.audit_max_lag_seconds,
+            is_idle=lambda: not WRITE_GATE.in_flight,
+        )
+
+
+@app.on_event("shutdown")
+def stop_auditor():
+    AUDITOR.stop()
 
 
 # -------------------------------------------------------------------------------------
@@ -17,7 +97,7 @@ app = FastAPI()
 
 
 @app.post("/account", response_model=aledger.service.AccountView)
-def register_account(command: commands.RegisterAccount):
+def register_account(request: Request, command: commands.RegisterAccount):
     try:
         account = aledger.service.register_account(command)
     except aledger.exceptions.AccountAlreadyExists:
@@ -29,21 +109,67 @@ def register_account(command: commands.RegisterAccount):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="account with the specified name already exists",
         )
-    return account
+    return negotiate(request, account)
 
 
 @app.get("/account/{account_id}", response_model=aledger.service.AccountView)
-def retrieve_account(account_id: uuid.UUID):
+def retrieve_account(request: Request, account_id: uuid.UUID):
     try:
-        return aledger.service.retrieve_account(account_id)
+        return negotiate(request, aledger.service.retrieve_account(account_id))
     except aledger.exceptions.AccountNotFound:
         raise HTTPException(status_code=404)
 
 
+@app.get("/account/{account_id}/entries", response_model=list[models.AccountEntry])
+def retrieve_account_entries(
+    request: Request,
+    account_id: uuid.UUID,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+):
+    try:
+        entries = aledger.service.retrieve_account_entries(account_id, offset, limit)
+        return negotiate(request, entries)
+    except aledger.exceptions.AccountNotFound:
+        raise HTTPException(status_code=404)
+
+
+@app.get("/account/{account_id}/turnover", response_model=aledger.service.TurnoverView)
+def retrieve_turnover(
+    request: Request,
+    account_id: uuid.UUID,
+    start: datetime = Query(..., alias="from"),
+    end: datetime = Query(..., alias="to"),
+    bucket: models.TurnoverBucket = models.TurnoverBucket.DAY,
+):
+    try:
+        turnover = aledger.service.retrieve_turnover(account_id, start, end, bucket)
+        return negotiate(request, turnover)
+    except aledger.exceptions.AccountNotFound:
+        raise HTTPException(status_code=404)
+    except aledger.exceptions.InvalidTurnoverRange:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="turnover range ends before it starts"
+        )
+    except aledger.exceptions.TurnoverRangeTooLong:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"turnover range spans more than {SETTINGS.turnover_max_buckets} buckets",
+        )
+
+
 @app.post("/transaction", response_model=models.Transaction)
-def post_transaction(command: commands.PostTransaction):
+def post_transaction(request: Request, command: commands.PostTransaction):
+    return _post_transaction(request, aledger.service.post_transaction, command)
+
+
+def _post_transaction(
+    request: Request,
+    handler: Callable[..., models.Transaction],
+    command: commands.PostTransaction,
+):
     try:
-        transaction = aledger.service.post_transaction(command)
+        transaction = handler(command)
     except aledger.exceptions.AccountNotFound:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="account not found")
     except aledger.exceptions.TransactionUnbalanced:
@@ -59,7 +185,129 @@ def post_transaction(command: commands.PostTransaction):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="transaction entry with the specified id already exists",
         )
-    return transaction
+    except aledger.exceptions.TransactionInClosedPeriod:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="transaction is dated within a closed period",
+        )
+    except aledger.exceptions.TransactionDatedInFuture:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="transaction is dated in the future"
+        )
+    return negotiate(request, transaction)
+
+
+# -------------------------------------------------------------------------------------
+# Operational Endpoints
+# -------------------------------------------------------------------------------------
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def export_metrics():
+    return METRICS.render()
+
+
+# -------------------------------------------------------------------------------------
+# Admin Endpoints
+# -------------------------------------------------------------------------------------
+
+
+def require_admin(x_admin_token: str = Header(None)):
+    admin_token = SETTINGS.admin_token
+    if not admin_token or not x_admin_token:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+    if not secrets.compare_digest(x_admin_token, admin_token.get_secret_value()):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN)
+
+
+admin = APIRouter(
+    prefix="/admin", route_class=NegotiatedRoute, dependencies=[Depends(require_admin)]
+)
+
+
+@admin.put("/account/{account_id}/slots", response_model=aledger.service.AccountView)
+def configure_account_slots(
+    request: Request,
+    account_id: uuid.UUID,
+    slots: int = Body(..., embed=True, ge=1, le=models.MAX_ACCOUNT_SLOTS),
+):
+    try:
+        command = commands.ConfigureAccountSlots(account_id=account_id, slots=slots)
+        return negotiate(request, aledger.service.configure_account_slots(command))
+    except aledger.exceptions.AccountNotFound:
+        raise HTTPException(status_code=404)
+
+
+@admin.post("/transaction", response_model=models.Transaction)
+def post_backdated_transaction(request: Request, command: commands.PostBackdatedTransaction):
+    return _post_transaction(request, aledger.service.post_backdated_transaction, command)
+
+
+@admin.post("/period/close", response_model=aledger.service.views.PeriodCloseView)
+def close_period(request: Request, command: commands.ClosePeriod):
+    try:
+        period = aledger.service.close_period(command)
+    except aledger.exceptions.InvalidPeriodCutoff:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail="period cutoff lies in the future"
+        )
+    return negotiate(request, period)
+
+
+@admin.get("/profiler", response_model=ProfilerSettings)
+def retrieve_profiler_settings(request: Request):
+    return negotiate(request, PROFILER.settings)
+
+
+@admin.put("/profiler", response_model=ProfilerSettings)
+def configure_profiler(request: Request, settings: ProfilerSettings):
+    PROFILER.configure(settings)
+    return negotiate(request, PROFILER.settings)
+
+
+@admin.get("/profiler/stacks", response_class=PlainTextResponse)
+def export_profiler_stacks():
+    return PROFILER.collapsed()
+
+
+@admin.delete("/profiler/stacks", status_code=status.HTTP_204_NO_CONTENT)
+def reset_profiler_stacks():
+    PROFILER.reset()
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+
+@admin.get("/profiler/slow", response_model=list[SlowCall])
+def retrieve_slow_calls(request: Request):
+    return negotiate(request, list(PROFILER.slow_calls))
+
+
+@admin.get("/audit", response_model=AuditStatus)
+def retrieve_audit_status(request: Request):
+    return negotiate(request, AUDITOR.status())
+
+
+EXPORT_MEDIA_TYPES = {
+    models.ExportFormat.PARQUET: "application/vnd.apache.parquet",
+    models.ExportFormat.ARROW: "application/vnd.apache.arrow.stream",
+    models.ExportFormat.CSV: "text/csv",
+}
+
+
+@admin.get("/export/journal", response_class=StreamingResponse)
+def export_journal(
+    format: models.ExportFormat = models.ExportFormat.PARQUET,
+    batch_size: int = Query(10000, ge=1, le=1000000),
+):
+    format, chunks = aledger.service.retrieve_journal(format, batch_size)
+    filename = f"journal.{format.value}"
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={"content-disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+app.include_router(admin)
 
 
 # -------------------------------------------------------------------------------------
@@ -70,19 +318,22 @@ def post_transaction(command: commands.PostTransaction):
 @app.exception_handler(HTTPException)
 async def exception_handler(request, exc):
     if exc.status_code == status.HTTP_400_BAD_REQUEST:
-        return JSONResponse(
-            jsonable_encoder({"error": "error.application_error", "detail": exc.detail}),
+        return negotiate(
+            request,
+            {"error": "error.application_error", "detail": exc.detail},
             status_code=status.HTTP_400_BAD_REQUEST,
         )
-    return JSONResponse(
-        jsonable_encoder({"error": "error.generic_error", "detail": exc.detail}),
+    return negotiate(
+        request,
+        {"error": "error.generic_error", "detail": exc.detail},
         status_code=exc.status_code,
     )
 
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request, exc):
-    return JSONResponse(
-        jsonable_encoder({"error": "error.field_validation_failure", "detail": exc.errors()}),
+    return negotiate(
+        request,
+        {"error": "error.field_validation_failure", "detail": jsonable_encoder(exc.errors())},
         status_code=status.HTTP_400_BAD_REQUEST,
     )
@@ -1,6 +1,7 @@
 import uuid
+from datetime import datetime
 from typing import Optional
-from .models import Direction, AccountEntry, Label
+from .models import Direction, AccountEntry, Label, SlotCount
 from pydantic import BaseModel, Field
 
 
@@ -18,3 +19,16 @@ class PostTransaction(Command):
     id: Optional[uuid.UUID] = Field(default_factory=uuid.uuid4)
     name: Optional[Label] = Field(default_factory=lambda: "txn")  # type: ignore
     entries: list[AccountEntry] = Field(default_factory=list)
+
+
+class PostBackdatedTransaction(PostTransaction):
+    posted_at: datetime
+
+
+class ConfigureAccountSlots(Command):
+    account_id: uuid.UUID
+    slots: SlotCount  # type: ignore
+
+
+class ClosePeriod(Command):
+    cutoff: datetime
@@ -1,58 +1,117 @@
 import enum
 import uuid
-from pydantic import BaseModel, Field, PositiveInt
-from pydantic.types import constr
+from datetime import datetime, timezone
+from typing import Optional
+from pydantic import BaseModel, Field, validator
+from pydantic.types import conint, constr
 from aledger.exceptions import AccountEntryAlreadyExists
 
 
 Label = constr(strip_whitespace=True, min_length=3, max_length=50)
 
+# Amounts fit in a signed 64 bit integer, the widest integer of the wire and storage formats.
+MAX_AMOUNT = 2 ** 63 - 1
+Amount = conint(gt=0, le=MAX_AMOUNT)
+
+MAX_ACCOUNT_SLOTS = 64
+SlotCount = conint(ge=1, le=MAX_ACCOUNT_SLOTS)
+
 
 class Direction(enum.Enum):
     CREDIT = "credit"
     DEBIT = "debit"
 
 
+class TurnoverBucket(enum.Enum):
+    HOUR = "hour"
+    DAY = "day"
+    MONTH = "month"
+
+
+class ExportFormat(enum.Enum):
+    PARQUET = "parquet"
+    ARROW = "arrow"
+    CSV = "csv"
+
+
+def utcnow() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def as_utc(moment: Optional[datetime]) -> Optional[datetime]:
+    # Naive timestamps are taken to be in UTC.
+    if moment is None or moment.tzinfo is not None:
+        return moment
+    return moment.replace(tzinfo=timezone.utc)
+
+
 class AccountEntry(BaseModel):
     id: uuid.UUID = Field(default_factory=uuid.uuid4)
     account_id: uuid.UUID
     direction: Direction
-    amount: PositiveInt
+    amount: Amount  # type: ignore
+    posted_at: Optional[datetime] = None
+
+    _posted_at_as_utc = validator("posted_at", allow_reuse=True)(as_utc)
 
 
 class Account(BaseModel):
     id: uuid.UUID = Field(default_factory=uuid.uuid4)
     name: Label  # type: ignore
     direction: Direction
+
+    # Balance carried forward from the entries of closed periods, which are no longer live.
+    opening_balance: int = 0
     entries: list[AccountEntry] = Field(default_factory=list)
 
-    def add_entry(self, direction, amount, id=None):
+    # Sub-balances that add up to the account balance. Hot accounts use several slots so that
+    # concurrent postings can be applied without contending on a single balance.
+    slots: list[int] = None  # type: ignore
+
+    @validator("slots", always=True)
+    def default_slots(cls, slots, values):
+        if slots:
+            return slots
+        direction = values.get("direction")
+        entries = values.get("entries", [])
+        return [
+            values.get("opening_balance", 0)
+            + sum([entry.amount * (-1 if entry.direction != direction else 1) for entry in entries])
+        ]
+
+    def add_entry(self, direction, amount, id=None, posted_at=None):
         if id and id in [entry.id for entry in self.entries]:
             raise AccountEntryAlreadyExists()
-        self.entries.append(
+        self.apply_entry(
             AccountEntry(
                 id=id,
                 account_id=self.id,
                 direction=direction,
                 amount=amount,
+                posted_at=posted_at or utcnow(),
             )
         )
 
+    def apply_entry(self, entry, slot=0):
+        self.entries.append(entry)
+        self.slots[slot] += self.signed_amount(entry)
+
+    def signed_amount(self, entry):
+        return entry.amount * (-1 if entry.direction != self.direction else 1)
+
     @property
     def balance(self):
-        return sum(
-            [
-                entry.amount * (-1 if entry.direction != self.direction else 1)
-                for entry in self.entries
-            ]
-        )
+        return sum(self.slots)
 
 
 class Transaction(BaseModel):
     id: uuid.UUID
     name: Label  # type: ignore
+    posted_at: datetime = Field(default_factory=utcnow)
     entries: list[AccountEntry]
 
+    _posted_at_as_utc = validator("posted_at", allow_reuse=True)(as_utc)
+
     @property
     def is_balanced(self):
         credits = [entry.amount for entry in self.entries if entry.direction == Direction.CREDIT]
@@ -24,3 +24,23 @@ class AccountNameAlreadyExists(AledgerException):
 
 class AccountEntryAlreadyExists(AledgerException):
     pass
+
+
+class InvalidTurnoverRange(AledgerException):
+    pass
+
+
+class TurnoverRangeTooLong(AledgerException):
+    pass
+
+
+class InvalidPeriodCutoff(AledgerException):
+    pass
+
+
+class TransactionInClosedPeriod(AledgerException):
+    pass
+
+
+class TransactionDatedInFuture(AledgerException):
+    pass
@@ -0,0 +1,55 @@
+import threading
+from typing import Iterator
+
+
+class Metric:
+    """A named family of values, one per set of label values."""
+
+    def __init__(self, name: str, description: str, kind: str) -> None:
+        self.name = name
+        self.description = description
+        self.kind = kind
+        self._lock = threading.Lock()
+        self._values: dict[tuple[tuple[str, str], ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, value: float, **labels: str) -> None:
+        self._values[tuple(sorted(labels.items()))] = value
+
+    def get(self, **labels: str) -> float:
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.description}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for key, value in sorted(self._values.items()):
+            labels = ",".join(f'{name}="{label}"' for name, label in key)
+            yield f"{self.name}{{{labels}}} {value:g}" if labels else f"{self.name} {value:g}"
+
+
+class MetricsRegistry:
+    """Holds the application metrics and renders them in the Prometheus text format."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+
+    def counter(self, name: str, description: str) -> Metric:
+        return self._register(name, description, "counter")
+
+    def gauge(self, name: str, description: str) -> Metric:
+        return self._register(name, description, "gauge")
+
+    def render(self) -> str:
+        return "".join(f"{line}\n" for metric in self._metrics.values() for line in metric.render())
+
+    def _register(self, name: str, description: str, kind: str) -> Metric:
+        if name not in self._metrics:
+            self._metrics[name] = Metric(name, description, kind)
+        return self._metrics[name]
+
+
+METRICS = MetricsRegistry()
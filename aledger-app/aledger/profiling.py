@@ -0,0 +1,158 @@
+import collections
+import functools
+import random
+import sys
+import threading
+import time
+from types import FrameType
+from typing import Any, Callable, Optional
+from pydantic import BaseModel, confloat
+
+
+class ProfilerSettings(BaseModel):
+    enabled: bool = False
+    # Fraction of the profiled calls whose samples are kept.
+    sample_rate: confloat(ge=0, le=1) = 0.01  # type: ignore
+    # Calls slower than this (in milliseconds) are kept regardless of the sample rate.
+    slow_threshold_ms: Optional[confloat(gt=0)] = None  # type: ignore
+    # Time between stack samples (in milliseconds).
+    interval_ms: confloat(ge=0.1, le=1000) = 5  # type: ignore
+
+
+class SlowCall(BaseModel):
+    name: str
+    tags: dict[str, Any]
+    duration_ms: float
+    stacks: dict[str, int]
+
+
+class Capture:
+    __slots__ = ("root", "samples")
+
+    def __init__(self, root: FrameType) -> None:
+        self.root = root
+        self.samples: collections.Counter[str] = collections.Counter()
+
+
+class SamplingProfiler:
+    """Statistical profiler for selected calls, aggregated as collapsed stacks.
+
+    While enabled, a background thread periodically samples the stack of the threads running
+    profiled calls. Samples are tagged with the call name and tags, so that flame graphs can
+    tell apart, for instance, postings with few legs from postings with many.
+    """
+
+    def __init__(self) -> None:
+        self.settings = ProfilerSettings()
+        self.stacks: collections.Counter[str] = collections.Counter()
+        self.slow_calls: collections.deque[SlowCall] = collections.deque(maxlen=100)
+        self._active: dict[int, Capture] = {}
+        self._lock = threading.Lock()
+        self._sampler: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.settings.enabled
+
+    def configure(self, settings: ProfilerSettings) -> None:
+        self.settings = settings
+        if settings.enabled and not (self._sampler and self._sampler.is_alive()):
+            self._sampler = threading.Thread(target=self._sample_loop, daemon=True)
+            self._sampler.start()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.stacks = collections.Counter()
+            self.slow_calls.clear()
+
+    def collapsed(self) -> str:
+        """Renders the aggregated samples in the collapsed stack format of flame graph tools."""
+        with self._lock:
+            return "".join(f"{stack} {count}\n" for stack, count in sorted(self.stacks.items()))
+
+    def run(self, name: str, tags: Callable[..., dict], function: Callable, *args, **kwargs):
+        settings = self.settings
+        sampled = random.random() < settings.sample_rate
+        if not sampled and settings.slow_threshold_ms is None:
+            return function(*args, **kwargs)
+
+        thread_id = threading.get_ident()
+        capture = Capture(sys._getframe())
+        with self._lock:
+            nested = self._active.setdefault(thread_id, capture) is not capture
+        if nested:
+            # The thread is sampled for an outer profiled call, this one shows in its stacks.
+            return function(*args, **kwargs)
+
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            duration_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                del self._active[thread_id]
+            slow = settings.slow_threshold_ms is not None
+            slow = slow and duration_ms >= settings.slow_threshold_ms  # type: ignore
+            if sampled or slow:
+                self._record(name, tags(*args, **kwargs), duration_ms, capture, slow)
+
+    def _record(self, name: str, tags: dict, duration_ms: float, capture: Capture, slow: bool):
+        prefix = ";".join([name] + [f"{key}={value}" for key, value in tags.items()])
+        with self._lock:
+            for stack, count in capture.samples.items():
+                self.stacks[f"{prefix};{stack}"] += count
+            if slow:
+                self.slow_calls.append(
+                    SlowCall(
+                        name=name,
+                        tags=tags,
+                        duration_ms=duration_ms,
+                        stacks=dict(capture.samples),
+                    )
+                )
+
+    def _sample_loop(self) -> None:
+        while self.settings.enabled:
+            time.sleep(self.settings.interval_ms / 1000)
+            frames = sys._current_frames()
+            with self._lock:
+                for thread_id, capture in list(self._active.items()):
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        capture.samples[self._collapse(frame, capture.root)] += 1
+
+    @staticmethod
+    def _collapse(frame: Optional[FrameType], root: FrameType) -> str:
+        # Walks from the sampled frame up to the frame that started the capture.
+        names = []
+        while frame is not None and frame is not root:
+            names.append(f"{frame.f_globals.get('__name__')}:{frame.f_code.co_name}")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+
+def depth_bucket(count: int) -> int:
+    """Rounds a count up to a power of two, to keep tag values few."""
+    return 1 << (count - 1).bit_length() if count > 0 else 0
+
+
+def profiled(name: str, tags: Callable[..., dict] = lambda *args, **kwargs: {}) -> Callable:
+    """Makes calls to the decorated function eligible for profiling.
+
+    The tags callable receives the call arguments, and is only called for calls whose samples
+    are kept. When the profiler is disabled the only cost is checking that it is.
+    """
+
+    def decorator(function: Callable) -> Callable:
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not PROFILER.settings.enabled:
+                return function(*args, **kwargs)
+            return PROFILER.run(name, tags, function, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+PROFILER = SamplingProfiler()
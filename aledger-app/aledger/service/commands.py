@@ -1,24 +1,47 @@
+from datetime import datetime
 from aledger.domain import commands
-from aledger.domain import Account, Transaction
+from aledger.domain import Account, Transaction, as_utc, utcnow
 from aledger.adapters import ACCOUNTS_REPOSITORY, TRANSACTIONS_REPOSITORY
-from .views import AccountView
+from aledger.profiling import depth_bucket, profiled
+from .views import AccountView, PeriodCloseView
 
 from aledger.exceptions import (
+    AccountEntryAlreadyExists,
+    AccountNotFound,
+    InvalidPeriodCutoff,
+    TransactionDatedInFuture,
+    TransactionAlreadyExists,
+    TransactionInClosedPeriod,
     TransactionUnbalanced,
 )
 
 
 __all__ = [
     "post_transaction",
+    "post_backdated_transaction",
     "register_account",
+    "configure_account_slots",
+    "close_period",
 ]
 
 
+def _posting_tags(cmd: commands.PostTransaction) -> dict:
+    account_ids = set([entry.account_id for entry in cmd.entries])
+    history = max([ACCOUNTS_REPOSITORY.count_entries(id) for id in account_ids], default=0)
+    return {
+        "legs": len(cmd.entries),
+        "accounts": len(account_ids),
+        "history": depth_bucket(history),
+    }
+
+
+@profiled("post_transaction", tags=_posting_tags)
 def post_transaction(cmd: commands.PostTransaction) -> Transaction:
     """PostTransaction Command Handler
 
     Validates and persists a transaction, and submits account entries to the respective
     accounts. The transaction must be uniquely identified and balanced in to be accepted.
+    The transaction and its entries are stamped with the current time.
 
     Args:
         cmd (commands.PostTransaction): the command message
@@ -32,17 +55,71 @@ def post_transaction(cmd: commands.PostTransaction) -> Transaction:
     Returns:
         Transaction: details about the posted transaction.
     """
-    txn = Transaction(id=cmd.id, name=cmd.name, entries=cmd.entries)
+    return _post_transaction(cmd, utcnow())
+
+
+@profiled("post_backdated_transaction", tags=_posting_tags)
+def post_backdated_transaction(cmd: commands.PostBackdatedTransaction) -> Transaction:
+    """PostBackdatedTransaction Command Handler
+
+    Posts a transaction as the PostTransaction command handler does, but stamps it with the
+    given posting time, e.g. to record a transaction that happened before it was submitted.
+
+    Args:
+        cmd (commands.PostBackdatedTransaction): the command message
+
+    Raises:
+        TransactionDatedInFuture: when the posting time lies in the future.
+        TransactionUnbalanced: when the transaction entries don't balance.
+        AccountNotFound: when an entry refers to a non-existent account.
+        TransactionAlreadyExists: when a transaction already exists for the given id.
+        AccountEntryAlreadyExists: when an entry already exists for a given entry id.
+        TransactionInClosedPeriod: when the transaction is dated within a closed period.
+
+    Returns:
+        Transaction: details about the posted transaction.
+    """
+    posted_at = as_utc(cmd.posted_at)
+    if posted_at > utcnow():  # type: ignore
+        raise TransactionDatedInFuture()
+    return _post_transaction(cmd, posted_at)  # type: ignore
+
+
+def _post_transaction(cmd: commands.PostTransaction, posted_at: datetime) -> Transaction:
+    # Stamps the transaction and each of its entries with the posting time.
+    txn = Transaction(
+        id=cmd.id,
+        name=cmd.name,
+        posted_at=posted_at,
+        entries=[entry.copy(update={"posted_at": posted_at}) for entry in cmd.entries],
+    )
 
     # Verifies the transaction's health before posting.
     if not txn.is_balanced:
         raise TransactionUnbalanced()
+    closed_through = ACCOUNTS_REPOSITORY.closed_through
+    if closed_through and txn.posted_at < closed_through:
+        raise TransactionInClosedPeriod()
+
+    # Verifies every account exists before any of them is touched.
+    for entry in txn.entries:
+        if not ACCOUNTS_REPOSITORY.exists(entry.account_id):
+            raise AccountNotFound()
+
+    # Verifies the transaction and entry ids are unused before any entry is posted. The
+    # repositories still refuse ids claimed by a concurrent posting in the meantime.
+    if TRANSACTIONS_REPOSITORY.exists(txn.id):
+        raise TransactionAlreadyExists(txn.id)
+    entry_ids = set([entry.id for entry in txn.entries])
+    if len(entry_ids) < len(txn.entries):
+        raise AccountEntryAlreadyExists(entry_ids)
+    repeated_entry_ids = set([id for id in entry_ids if ACCOUNTS_REPOSITORY.is_entry_claimed(id)])
+    if repeated_entry_ids:
+        raise AccountEntryAlreadyExists(repeated_entry_ids)
 
     # Adds the transaction's entries to the respective accounts.
     for entry in txn.entries:
-        account = ACCOUNTS_REPOSITORY.get(entry.account_id)
-        account.add_entry(entry.direction, entry.amount, id=entry.id)
-        ACCOUNTS_REPOSITORY.update(account)
+        ACCOUNTS_REPOSITORY.post_entry(entry)
 
     # Saves the posted transaction to storage.
     TRANSACTIONS_REPOSITORY.add(txn)
@@ -73,3 +150,54 @@ def register_account(cmd: commands.RegisterAccount) -> AccountView:
         direction=account.direction,
         balance=0,
     )
+
+
+def configure_account_slots(cmd: commands.ConfigureAccountSlots) -> AccountView:
+    """ConfigureAccountSlots Command Handler
+
+    Changes the number of balance slots of an account. Marking a frequently posted-to account
+    as hot, by giving it several slots, lets concurrent postings update its balance in
+    parallel. The account balance is preserved when slots are added or removed.
+
+    Args:
+        cmd (commands.ConfigureAccountSlots): the command message
+
+    Raises:
+        AccountNotFound: when a valid account cannot be found for the given id.
+
+    Returns:
+        AccountView: details about the configured account
+    """
+    ACCOUNTS_REPOSITORY.set_slots(cmd.account_id, cmd.slots)
+    account = ACCOUNTS_REPOSITORY.get(cmd.account_id)
+    return AccountView(
+        id=account.id,
+        name=account.name,
+        direction=account.direction,
+        balance=account.balance,
+    )
+
+
+def close_period(cmd: commands.ClosePeriod) -> PeriodCloseView:
+    """ClosePeriod Command Handler
+
+    Closes the ledger period ending at the cutoff. Entries and transactions posted before the
+    cutoff are moved from memory to cold storage, and the balance of the entries is carried
+    forward as opening balance. Transactions dated before the cutoff are refused afterwards.
+
+    Args:
+        cmd (commands.ClosePeriod): the command message
+
+    Raises:
+        InvalidPeriodCutoff: when the cutoff lies in the future.
+
+    Returns:
+        PeriodCloseView: details about the closed period
+    """
+    cutoff = as_utc(cmd.cutoff)
+    if cutoff > utcnow():  # type: ignore
+        raise InvalidPeriodCutoff()
+    closed_entries = ACCOUNTS_REPOSITORY.close_period(
+        cutoff, TRANSACTIONS_REPOSITORY  # type: ignore
+    )
+    return PeriodCloseView(cutoff=cutoff, closed_entries=closed_entries)
@@ -1,9 +1,22 @@
+import itertools
 import uuid
-from aledger.adapters import ACCOUNTS_REPOSITORY
-from aledger.exceptions import AccountNotFound
-from .views import AccountView
+from datetime import datetime
+from typing import Iterator
+from aledger.domain import AccountEntry, ExportFormat, TurnoverBucket
+from aledger.adapters import ACCOUNTS_REPOSITORY, TRANSACTIONS_REPOSITORY
+from aledger.adapters.export import export_journal, resolve_format
+from aledger.adapters.turnover import bucket_index, bucket_start
+from aledger.exceptions import AccountNotFound, InvalidTurnoverRange, TurnoverRangeTooLong
+from aledger.settings import SETTINGS
+from aledger.profiling import depth_bucket, profiled
+from .views import AccountView, TurnoverView, TurnoverBucketView
 
 
+def _account_tags(account_id: uuid.UUID) -> dict:
+    return {"history": depth_bucket(ACCOUNTS_REPOSITORY.count_entries(account_id))}
+
+
+@profiled("retrieve_account", tags=_account_tags)
 def retrieve_account(account_id: uuid.UUID) -> AccountView:
     """RetrieveAccount Query Handler
 
@@ -31,3 +44,94 @@ def retrieve_account(account_id: uuid.UUID) -> AccountView:
         direction=account.direction,
         balance=balance,
     )
+
+
+def retrieve_account_entries(account_id: uuid.UUID, offset: int, limit: int) -> list[AccountEntry]:
+    """RetrieveAccountEntries Query Handler
+
+    Pages through the history of an account in posting order, closed periods included.
+
+    Args:
+        account_id (uuid.UUID): the id of the account whose entries to retrieve
+        offset (int): the number of entries to skip
+        limit (int): the maximum number of entries to retrieve
+
+    Raises:
+        AccountNotFound: when a valid account cannot be found for the given id.
+
+    Returns:
+        list[AccountEntry]: the entries of the page
+    """
+    return list(itertools.islice(ACCOUNTS_REPOSITORY.iter_entries(account_id, offset), limit))
+
+
+def retrieve_turnover(
+    account_id: uuid.UUID, start: datetime, end: datetime, bucket: TurnoverBucket
+) -> TurnoverView:
+    """RetrieveTurnover Query Handler
+
+    Reports the debit and credit turnover of an account for every bucket touched by the
+    given time range, both ends included. Each bucket total is answered by the account's
+    turnover index in logarithmic time, regardless of the length of the account history. The
+    overall totals are added up from the buckets, so they always match them.
+
+    Args:
+        account_id (uuid.UUID): the id of the account to report on
+        start (datetime): a point in time within the first bucket of the report
+        end (datetime): a point in time within the last bucket of the report
+        bucket (TurnoverBucket): the size of the report buckets
+
+    Raises:
+        AccountNotFound: when a valid account cannot be found for the given id.
+        InvalidTurnoverRange: when the range ends before it starts.
+        TurnoverRangeTooLong: when the range spans more buckets than the configured maximum.
+
+    Returns:
+        TurnoverView: the turnover totals, overall and per bucket
+    """
+    if not ACCOUNTS_REPOSITORY.exists(account_id):
+        raise AccountNotFound()
+
+    first = bucket_index(start, bucket)
+    last = bucket_index(end, bucket)
+    if last < first:
+        raise InvalidTurnoverRange()
+    if last - first + 1 > SETTINGS.turnover_max_buckets:
+        raise TurnoverRangeTooLong()
+
+    report = ACCOUNTS_REPOSITORY.turnover_report(account_id, bucket, first, last + 1)
+    buckets = [
+        TurnoverBucketView(start=bucket_start(position, bucket), debit=debit, credit=credit)
+        for position, (debit, credit) in enumerate(report, start=first)
+    ]
+
+    return TurnoverView(
+        account_id=account_id,
+        bucket=bucket,
+        start=bucket_start(first, bucket),
+        end=bucket_start(last + 1, bucket),
+        debit=sum([debit for debit, _ in report]),
+        credit=sum([credit for _, credit in report]),
+        buckets=buckets,
+    )
+
+
+def retrieve_journal(format: ExportFormat, batch_size: int) -> tuple[ExportFormat, Iterator[bytes]]:
+    """RetrieveJournal Query Handler
+
+    Streams every journal entry, alongside the transaction it was posted with, as encoded
+    record batches, closed periods included. Transactions posted after the export starts are
+    left out, and memory use is bounded by the batch size rather than by the size of the
+    journal.
+
+    Args:
+        format (ExportFormat): the requested file format
+        batch_size (int): the number of journal entries per record batch
+
+    Returns:
+        tuple[ExportFormat, Iterator[bytes]]: the actual file format, which falls back to CSV
+            when columnar formats are unavailable, and the file contents in chunks
+    """
+    format = resolve_format(format)
+    transactions = ACCOUNTS_REPOSITORY.journal(TRANSACTIONS_REPOSITORY)
+    return format, export_journal(transactions, format, batch_size)
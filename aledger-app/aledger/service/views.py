@@ -1,6 +1,7 @@
 import uuid
+from datetime import datetime
 from pydantic import BaseModel
-from aledger.domain import Direction
+from aledger.domain import Direction, TurnoverBucket
 
 
 class AccountView(BaseModel):
@@ -8,3 +9,24 @@ class AccountView(BaseModel):
     name: str
     direction: Direction
     balance: int
+
+
+class TurnoverBucketView(BaseModel):
+    start: datetime
+    debit: int
+    credit: int
+
+
+class TurnoverView(BaseModel):
+    account_id: uuid.UUID
+    bucket: TurnoverBucket
+    start: datetime
+    end: datetime
+    debit: int
+    credit: int
+    buckets: list[TurnoverBucketView]
+
+
+class PeriodCloseView(BaseModel):
+    cutoff: datetime
+    closed_entries: int
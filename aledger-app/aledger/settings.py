@@ -0,0 +1,40 @@
+from typing import Optional
+from pydantic import BaseSettings, DirectoryPath, PositiveFloat, SecretStr, conint
+
+
+class Settings(BaseSettings):
+    """Runtime settings, read from ALEDGER_* environment variables."""
+
+    # Admission control: postings and reads are admitted through separate gates, each with
+    # a bound on concurrent requests and on requests waiting for a turn.
+    read_concurrency: conint(ge=1) = 16  # type: ignore
+    read_queue_depth: conint(ge=0) = 64  # type: ignore
+    write_concurrency: conint(ge=1) = 16  # type: ignore
+    write_queue_depth: conint(ge=0) = 64  # type: ignore
+    queue_timeout: PositiveFloat = 0.25
+    small_transaction_bytes: conint(ge=0) = 2048  # type: ignore
+
+    # Upper bound on the number of buckets of a turnover report.
+    turnover_max_buckets: conint(ge=1) = 1000  # type: ignore
+
+    # Where the entries of closed periods are stored, defaults to a temporary directory.
+    segments_dir: Optional[DirectoryPath] = None
+
+    # Consistency auditor: verifies the ledger in slices of work, run while no postings are
+    # in flight, unless verification falls further behind than the maximum lag.
+    audit_enabled: bool = True
+    audit_slice_ms: PositiveFloat = 2
+    audit_interval_ms: PositiveFloat = 20
+    audit_max_lag_seconds: PositiveFloat = 60
+
+    # Token expected in the X-Admin-Token header by the /admin endpoints, disabled when unset.
+    admin_token: Optional[SecretStr] = None
+
+    # Where the command line interface reaches the HTTP API.
+    api_url: str = "http://localhost:8000"
+
+    class Config:
+        env_prefix = "ALEDGER_"
+
+
+SETTINGS = Settings()
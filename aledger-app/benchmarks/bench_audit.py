@@ -0,0 +1,77 @@
+"""Measures posting latency with the consistency auditor stopped and running, and audit lag.
+
+The auditor runs in the background with no idle check, which is its worst case: it competes
+with every posting, whereas the API only runs it while no postings are in flight.
+
+Usage:
+    python -m benchmarks.bench_audit --entries 200000 --postings 5000
+"""
+import argparse
+import random
+import statistics
+import time
+import aledger.service
+from aledger.adapters import ACCOUNTS_REPOSITORY, TRANSACTIONS_REPOSITORY
+from aledger.audit import AUDITOR, VERIFIED
+from aledger.domain import commands, Account, AccountEntry, Direction
+
+
+def post(accounts: list[Account]) -> None:
+    debit, credit = random.sample(accounts, 2)
+    entries = [
+        AccountEntry(account_id=debit.id, direction=Direction.DEBIT, amount=1),
+        AccountEntry(account_id=credit.id, direction=Direction.CREDIT, amount=1),
+    ]
+    aledger.service.post_transaction(commands.PostTransaction(entries=entries))
+
+
+def measure(label: str, accounts: list[Account], postings: int) -> None:
+    samples = []
+    for _ in range(postings):
+        started = time.perf_counter()
+        post(accounts)
+        samples.append((time.perf_counter() - started) * 1e6)
+    quantiles = statistics.quantiles(samples, n=100)
+    lag = AUDITOR.lag()
+    print(
+        f"{label:<8} post p50={quantiles[49]:>7.1f}us p99={quantiles[98]:>8.1f}us "
+        f"passes={AUDITOR.passes:>4} lag={'-' if lag is None else f'{lag:.2f}s'}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=200000)
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--postings", type=int, default=5000)
+    parser.add_argument("--slice-ms", type=float, default=2)
+    parser.add_argument("--interval-ms", type=float, default=20)
+    args = parser.parse_args()
+
+    ACCOUNTS_REPOSITORY.clear()
+    TRANSACTIONS_REPOSITORY.clear()
+    AUDITOR.reset()
+    accounts = [Account(name=f"acc-{i}", direction=Direction.DEBIT) for i in range(args.accounts)]
+    for account in accounts:
+        ACCOUNTS_REPOSITORY.add(account)
+    for _ in range(args.entries // 2):
+        post(accounts)
+
+    # Time to verify the whole ledger once, then only what changed since.
+    for label in ["full", "changes"]:
+        verified = VERIFIED.get(record="entry")
+        started = time.perf_counter()
+        while not AUDITOR.run_slice(1):
+            pass
+        elapsed = time.perf_counter() - started
+        entries = VERIFIED.get(record="entry") - verified
+        print(f"{label:<8} pass={elapsed * 1000:>8.1f}ms entries={entries:>8.0f}")
+
+    measure("stopped", accounts, args.postings)
+    AUDITOR.start(args.slice_ms, args.interval_ms, max_lag=60)
+    measure("running", accounts, args.postings)
+    AUDITOR.stop()
+
+
+if __name__ == "__main__":
+    main()
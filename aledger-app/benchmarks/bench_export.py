@@ -0,0 +1,69 @@
+"""Measures journal export throughput, in journal entries (rows) per second.
+
+Transactions are drawn from a small pool over and over, so journals well past 10M entries can
+be exported without holding them in memory. Peak RSS shows that memory use is bounded by the
+batch size.
+
+Usage:
+    python -m benchmarks.bench_export --entries 10000000 --formats parquet arrow csv
+"""
+import argparse
+import itertools
+import resource
+import time
+import uuid
+from aledger.adapters.export import export_journal, resolve_format
+from aledger.domain import AccountEntry, Direction, ExportFormat, Transaction, utcnow
+
+
+def make_journal(entries: int, legs: int):
+    pool = []
+    for _ in range(1000):
+        accounts = [uuid.uuid4() for _ in range(legs)]
+        pool.append(
+            Transaction.construct(
+                id=uuid.uuid4(),
+                name="txn",
+                posted_at=utcnow(),
+                entries=[
+                    AccountEntry.construct(
+                        id=uuid.uuid4(),
+                        account_id=account_id,
+                        direction=Direction.DEBIT if position else Direction.CREDIT,
+                        amount=100 if position else 100 * (legs - 1),
+                    )
+                    for position, account_id in enumerate(accounts)
+                ],
+            )
+        )
+    return itertools.islice(itertools.cycle(pool), entries // legs)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--entries", type=int, default=1000000)
+    parser.add_argument("--legs", type=int, default=2)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    parser.add_argument("--formats", nargs="+", default=[format.value for format in ExportFormat])
+    args = parser.parse_args()
+
+    for name in args.formats:
+        format = resolve_format(ExportFormat(name))
+        journal = make_journal(args.entries, args.legs)
+        written = 0
+        started = time.perf_counter()
+        with open("/dev/null", "wb") as output:
+            for chunk in export_journal(journal, format, args.batch_size):
+                written += len(chunk)
+                output.write(chunk)
+        elapsed = time.perf_counter() - started
+        peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        print(
+            f"format={format.value:<7} entries={args.entries} "
+            f"throughput={args.entries / elapsed:>10.0f} rows/s "
+            f"size={written / 2**20:>8.1f}MB peak_rss={peak_rss:>7.1f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Measures posting throughput on a skewed workload, with and without hot account slots.
+
+Every transaction credits a shared clearing account and debits one of many regular accounts.
+A storage write latency is simulated while a balance slot is held, which is what makes a
+single slot per account serialize all postings to the clearing account.
+
+Slots only remove that waiting: the in-memory bookkeeping runs under the interpreter lock, so
+with no write latency (--write-latency-us 0) throughput barely changes with the slot count.
+
+Usage:
+    python -m benchmarks.bench_hot_accounts --threads 16 --slots 1 4 16
+"""
+import argparse
+import threading
+import time
+from aledger.adapters import InMemoryAccountRepository
+from aledger.domain import Account, AccountEntry, Direction
+
+
+class SlowStorageAccountRepository(InMemoryAccountRepository):
+    def __init__(self, write_latency: float) -> None:
+        self.write_latency = write_latency
+        self.clear()
+
+    def _apply_entry(self, account, slot, entry):
+        time.sleep(self.write_latency)
+        super()._apply_entry(account, slot, entry)
+
+
+def run(threads: int, postings: int, slots: int, accounts: int, write_latency: float) -> float:
+    repository = SlowStorageAccountRepository(write_latency)
+    clearing = Account(name="clearing", direction=Direction.CREDIT)
+    repository.add(clearing)
+    repository.set_slots(clearing.id, slots)
+    regular = [Account(name=f"acc-{i}", direction=Direction.DEBIT) for i in range(accounts)]
+    for account in regular:
+        repository.add(account)
+
+    def post(worker: int) -> None:
+        for position in range(postings):
+            account = regular[(worker * postings + position) % accounts]
+            repository.post_entry(
+                AccountEntry(account_id=account.id, direction=Direction.DEBIT, amount=1)
+            )
+            repository.post_entry(
+                AccountEntry(account_id=clearing.id, direction=Direction.CREDIT, amount=1)
+            )
+
+    workers = [threading.Thread(target=post, args=(worker,)) for worker in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    assert repository.get(clearing.id).balance == threads * postings
+    return threads * postings / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--postings", type=int, default=200, help="transactions per thread")
+    parser.add_argument("--accounts", type=int, default=1000)
+    parser.add_argument("--slots", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--write-latency-us", type=float, default=200)
+    args = parser.parse_args()
+
+    for slots in args.slots:
+        throughput = run(
+            args.threads, args.postings, slots, args.accounts, args.write_latency_us / 1e6
+        )
+        print(f"threads={args.threads} slots={slots:>3} throughput={throughput:>10.0f} txn/s")
+
+
+if __name__ == "__main__":
+    main()
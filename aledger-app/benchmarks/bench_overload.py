@@ -0,0 +1,137 @@
+"""Drives the HTTP API past its capacity, with and without admission control.
+
+Requests arrive at a fixed rate regardless of how fast they are served (an open loop), and a
+service time is simulated in the handlers. Without admission control latency grows with the
+backlog; with it, excess requests are shed and the latency of served ones stays bounded.
+
+Usage:
+    python -m benchmarks.bench_overload --rate 3000 --duration 3 --service-time-ms 5
+"""
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import time
+import uuid
+import aledger.service
+from aledger.adapters import ACCOUNTS_REPOSITORY, TRANSACTIONS_REPOSITORY
+from aledger.controllers.admission import READ_GATE, WRITE_GATE
+from aledger.controllers.http import app
+from aledger.domain import Account, Direction
+
+
+def with_service_time(handler, service_time):
+    def slow_handler(*args, **kwargs):
+        time.sleep(service_time)
+        return handler(*args, **kwargs)
+
+    return slow_handler
+
+
+async def call(method: str, path: str, body: bytes = b"") -> tuple[int, float]:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("bench", 0),
+        "server": ("bench", 80),
+    }
+    status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    started = time.perf_counter()
+    await app(scope, receive, send)
+    return status, time.perf_counter() - started
+
+
+def percentile(latencies: list[float], fraction: float) -> float:
+    if not latencies:
+        return float("nan")
+    return statistics.quantiles(latencies, n=100, method="inclusive")[int(fraction * 100) - 1]
+
+
+async def drive(rate: int, duration: float, accounts: list[Account]) -> dict:
+    results: dict[str, list[tuple[int, float]]] = {"read": [], "write": []}
+
+    async def read():
+        account = random.choice(accounts)
+        results["read"].append(await call("GET", f"/account/{account.id}"))
+
+    async def write():
+        debit, credit = random.sample(accounts, 2)
+        entries = [
+            {"account_id": str(debit.id), "amount": 1, "direction": "debit"},
+            {"account_id": str(credit.id), "amount": 1, "direction": "credit"},
+        ]
+        body = json.dumps({"id": str(uuid.uuid4()), "entries": entries}).encode()
+        results["write"].append(await call("POST", "/transaction", body))
+
+    tasks = []
+    started = time.perf_counter()
+    for position in range(int(rate * duration)):
+        delay = started + position / rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        tasks.append(asyncio.create_task(read() if position % 2 else write()))
+    await asyncio.gather(*tasks)
+    return results
+
+
+def report(label: str, results: dict) -> None:
+    for kind, outcomes in results.items():
+        served = [latency * 1000 for status, latency in outcomes if status == 200]
+        shed = len([status for status, _ in outcomes if status in (429, 503)])
+        print(
+            f"{label:<18} {kind:<5} served={len(served):>6} shed={shed:>6} "
+            f"p50={percentile(served, 0.5):>8.1f}ms p99={percentile(served, 0.99):>8.1f}ms"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rate", type=int, default=3000, help="requests per second")
+    parser.add_argument("--duration", type=float, default=3)
+    parser.add_argument("--service-time-ms", type=float, default=5)
+    args = parser.parse_args()
+
+    service_time = args.service_time_ms / 1000
+    aledger.service.retrieve_account = with_service_time(
+        aledger.service.retrieve_account, service_time
+    )
+    aledger.service.post_transaction = with_service_time(
+        aledger.service.post_transaction, service_time
+    )
+
+    ACCOUNTS_REPOSITORY.clear()
+    TRANSACTIONS_REPOSITORY.clear()
+    accounts = [Account(name=f"acc-{i}", direction=Direction.DEBIT) for i in range(100)]
+    for account in accounts:
+        ACCOUNTS_REPOSITORY.add(account)
+
+    report("admission control", asyncio.run(drive(args.rate, args.duration, accounts)))
+
+    for gate in (READ_GATE, WRITE_GATE):
+        gate.concurrency = gate.queue_depth = 10 ** 9
+    report("unbounded", asyncio.run(drive(args.rate, args.duration, accounts)))
+
+
+if __name__ == "__main__":
+    main()
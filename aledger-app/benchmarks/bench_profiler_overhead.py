@@ -0,0 +1,52 @@
+"""Measures the overhead of the sampling profiler on retrieve_account.
+
+Compares the undecorated handler with the profiled one, while the profiler is disabled,
+sampling a fraction of calls, and capturing every call to look for slow ones.
+
+Usage:
+    python -m benchmarks.bench_profiler_overhead --calls 20000
+"""
+import argparse
+import time
+import aledger.service
+from aledger.adapters import ACCOUNTS_REPOSITORY
+from aledger.domain import Account, Direction
+from aledger.profiling import PROFILER, ProfilerSettings
+
+
+def per_call(function, account_id, calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        function(account_id)
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=20000)
+    args = parser.parse_args()
+
+    ACCOUNTS_REPOSITORY.clear()
+    account = Account(name="cash", direction=Direction.DEBIT)
+    ACCOUNTS_REPOSITORY.add(account)
+    profiled = aledger.service.retrieve_account
+    undecorated = profiled.__wrapped__
+
+    scenarios = [
+        ("undecorated", undecorated, ProfilerSettings()),
+        ("disabled", profiled, ProfilerSettings()),
+        ("sampling 1%", profiled, ProfilerSettings(enabled=True, sample_rate=0.01)),
+        (
+            "slow capture",
+            profiled,
+            ProfilerSettings(enabled=True, sample_rate=0, slow_threshold_ms=100),
+        ),
+    ]
+    for label, function, settings in scenarios:
+        PROFILER.configure(settings)
+        print(f"{label:<13} {per_call(function, account.id, args.calls):>7.2f}us/call")
+    PROFILER.configure(ProfilerSettings())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""Compares turnover range queries on the turnover index against filtering account entries.
+
+Usage:
+    python -m benchmarks.bench_turnover --history 10000 100000 --queries 200
+"""
+import argparse
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from aledger.adapters.turnover import TurnoverIndex, bucket_index
+from aledger.domain import AccountEntry, Direction, TurnoverBucket
+
+
+ORIGIN = datetime(2015, 1, 1, tzinfo=timezone.utc)
+
+
+def make_history(size: int) -> list[AccountEntry]:
+    account_id = uuid.uuid4()
+    return [
+        AccountEntry.construct(
+            id=uuid.uuid4(),
+            account_id=account_id,
+            direction=random.choice(list(Direction)),
+            amount=random.randint(1, 10000),
+            posted_at=ORIGIN + timedelta(minutes=7 * position),
+        )
+        for position in range(size)
+    ]
+
+
+def naive_turnover(entries, start, end, bucket):
+    # What a request handler would do without an index: filter the full entry list.
+    first, last = bucket_index(start, bucket), bucket_index(end, bucket)
+    totals = {Direction.DEBIT: 0, Direction.CREDIT: 0}
+    for entry in entries:
+        if first <= bucket_index(entry.posted_at, bucket) <= last:
+            totals[entry.direction] += entry.amount
+    return totals[Direction.DEBIT], totals[Direction.CREDIT]
+
+
+def indexed_turnover(index, start, end, bucket):
+    first, last = bucket_index(start, bucket), bucket_index(end, bucket)
+    return (
+        index.sum(bucket, Direction.DEBIT, first, last + 1),
+        index.sum(bucket, Direction.CREDIT, first, last + 1),
+    )
+
+
+def run(history: int, queries: int) -> None:
+    entries = make_history(history)
+    latest = ORIGIN + timedelta(minutes=7 * (history - 1))
+    span = latest - ORIGIN
+
+    started = time.perf_counter()
+    index = TurnoverIndex()
+    for entry in entries:
+        index.add(entry)
+    build = time.perf_counter() - started
+
+    ranges = []
+    for _ in range(queries):
+        start = ORIGIN + span * random.random()
+        ranges.append((start, start + (latest - start) * random.random()))
+
+    for bucket in TurnoverBucket:
+        started = time.perf_counter()
+        indexed = [indexed_turnover(index, start, end, bucket) for start, end in ranges]
+        indexed_time = (time.perf_counter() - started) / queries
+
+        naive_queries = ranges[: max(1, queries // 20)]
+        started = time.perf_counter()
+        naive = [naive_turnover(entries, start, end, bucket) for start, end in naive_queries]
+        naive_time = (time.perf_counter() - started) / len(naive_queries)
+
+        assert naive == indexed[: len(naive)]
+        print(
+            f"history={history:>9} bucket={bucket.value:<5} "
+            f"indexed={indexed_time * 1e6:>9.1f}us naive={naive_time * 1e6:>11.1f}us "
+            f"speedup={naive_time / indexed_time:>8.1f}x"
+        )
+    print(f"history={history:>9} index build {build / history * 1e6:.2f}us/entry")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--history", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    for history in args.history:
+        run(history, args.queries)
+
+
+if __name__ == "__main__":
+    main()
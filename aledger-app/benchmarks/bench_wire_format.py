@@ -0,0 +1,106 @@
+"""Compares the JSON and MessagePack wire formats of the HTTP API.
+
+Reports payload sizes, body parse and render times, and POST /transaction requests/sec
+through the ASGI test client.
+
+Usage:
+    python -m benchmarks.bench_wire_format --legs 2 10 50 --requests 500
+"""
+import argparse
+import json
+import time
+import uuid
+from fastapi.encoders import jsonable_encoder
+from fastapi.testclient import TestClient
+from aledger.adapters import ACCOUNTS_REPOSITORY, TRANSACTIONS_REPOSITORY
+from aledger.controllers import codecs
+from aledger.controllers.http import app
+from aledger.domain import commands, Account, Direction
+
+
+def make_accounts(legs: int) -> list[Account]:
+    ACCOUNTS_REPOSITORY.clear()
+    TRANSACTIONS_REPOSITORY.clear()
+    accounts = [Account(name=f"acc-{i}", direction=Direction.DEBIT) for i in range(legs)]
+    for account in accounts:
+        ACCOUNTS_REPOSITORY.add(account)
+    return accounts
+
+
+def make_body(accounts: list[Account], binary: bool) -> dict:
+    def encode_id(id):
+        return id.bytes if binary else str(id)
+
+    entries = [
+        {
+            "id": encode_id(uuid.uuid4()),
+            "account_id": encode_id(account.id),
+            "amount": 100 * (len(accounts) - 1) if position == 0 else 100,
+            "direction": (1 if binary else "debit")
+            if position == 0
+            else (0 if binary else "credit"),
+        }
+        for position, account in enumerate(accounts)
+    ]
+    return {"id": encode_id(uuid.uuid4()), "name": "bench", "entries": entries}
+
+
+def timeit(function, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - started) / repeat
+
+
+def run(legs: int, requests: int) -> None:
+    accounts = make_accounts(legs)
+    json_body = json.dumps(make_body(accounts, binary=False)).encode()
+    msgpack_body = codecs.pack(make_body(accounts, binary=True))
+    transaction = commands.PostTransaction.parse_obj(json.loads(json_body))
+
+    json_parse = timeit(lambda: commands.PostTransaction.parse_obj(json.loads(json_body)), requests)
+    msgpack_parse = timeit(
+        lambda: commands.PostTransaction.parse_obj(codecs.unpack(msgpack_body)), requests
+    )
+    json_render = timeit(lambda: json.dumps(jsonable_encoder(transaction)).encode(), requests)
+    msgpack_render = timeit(lambda: codecs.pack(transaction), requests)
+
+    client = TestClient(app)
+    throughput = {}
+    for name, content_type in [("json", "application/json"), ("msgpack", "application/msgpack")]:
+        headers = {"content-type": content_type, "accept": content_type}
+        started = time.perf_counter()
+        for _ in range(requests):
+            binary = name == "msgpack"
+            body = make_body(accounts, binary=binary)
+            data = codecs.pack(body) if binary else json.dumps(body).encode()
+            response = client.post("/transaction", data=data, headers=headers)
+            assert response.status_code == 200, response.content
+        throughput[name] = requests / (time.perf_counter() - started)
+
+    print(
+        f"legs={legs:>3} size json={len(json_body):>6}B msgpack={len(msgpack_body):>6}B "
+        f"({len(msgpack_body) / len(json_body):.0%})"
+    )
+    print(
+        f"legs={legs:>3} parse json={json_parse * 1e6:>8.1f}us "
+        f"msgpack={msgpack_parse * 1e6:>8.1f}us "
+        f"render json={json_render * 1e6:>8.1f}us msgpack={msgpack_render * 1e6:>8.1f}us"
+    )
+    print(
+        f"legs={legs:>3} throughput json={throughput['json']:>8.0f}req/s "
+        f"msgpack={throughput['msgpack']:>8.0f}req/s"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--legs", type=int, nargs="+", default=[2, 10, 50])
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+    for legs in args.legs:
+        run(legs, args.requests)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+import pytest
+import aledger.adapters.segments
+from aledger.adapters import InMemoryAccountRepository, InMemoryTransactionRepository
+from aledger.adapters.segments import SUFFIXES, ColdSegment
+from aledger.adapters.turnover import bucket_index
+from aledger.domain import Account, AccountEntry, Direction, Transaction, TurnoverBucket
+from aledger.exceptions import AccountEntryAlreadyExists
+
+
+def test_post_entry_on_hot_account_should_not_lose_concurrent_updates():
+    repository = InMemoryAccountRepository()
+    repository.clear()
+    account = Account(name="clearing", direction=Direction.CREDIT)
+    repository.add(account)
+    repository.set_slots(account.id, 8)
+
+    posted_at = datetime(2022, 1, 1, tzinfo=timezone.utc)
+
+    def post_entries():
+        for _ in range(500):
+            entry = AccountEntry(
+                account_id=account.id, direction=Direction.CREDIT, amount=2, posted_at=posted_at
+            )
+            repository.post_entry(entry)
+
+    threads = [threading.Thread(target=post_entries) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+
+    # Resize the slots while postings are in flight.
+    repository.set_slots(account.id, 3)
+    for thread in threads:
+        thread.join()
+
+    stored = repository.get(account.id)
+    assert len(stored.slots) == 3
+    assert len(stored.entries) == 8 * 500
+    assert stored.balance == 8 * 500 * 2
+
+    # Turnover is indexed per slot, reports add up every slot.
+    day = bucket_index(posted_at, TurnoverBucket.DAY)
+    report = repository.turnover_report(account.id, TurnoverBucket.DAY, day, day + 1)
+    assert report == [(0, 8 * 500 * 2)]
+
+
+def test_close_period_should_move_entries_to_cold_segments_and_keep_history():
+    repository = InMemoryAccountRepository()
+    repository.clear()
+    account = Account(name="cash", direction=Direction.DEBIT)
+    repository.add(account)
+
+    entries = [
+        AccountEntry(
+            account_id=account.id,
+            direction=Direction.DEBIT,
+            amount=amount,
+            posted_at=datetime(2021, month, 1, tzinfo=timezone.utc),
+        )
+        for month, amount in [(1, 10), (2, 20), (3, 30), (4, 40)]
+    ]
+    for entry in entries:
+        repository.post_entry(entry)
+
+    assert repository.close_period(datetime(2021, 2, 15, tzinfo=timezone.utc)) == 2
+    assert repository.close_period(datetime(2021, 3, 15, tzinfo=timezone.utc)) == 1
+
+    stored = repository.get(account.id)
+    assert [entry.id for entry in stored.entries] == [entries[3].id]
+    assert stored.opening_balance == 60
+    assert stored.balance == 100
+    assert list(repository.iter_entries(account.id)) == entries
+
+    # Closed periods are merged into a single segment.
+    assert len(repository._segments) == 1
+
+    # Closed entry ids stay claimed.
+    with pytest.raises(AccountEntryAlreadyExists):
+        repository.post_entry(entries[0])
+    repository.clear()
+
+
+def test_close_period_should_change_nothing_when_the_segment_cannot_be_written(monkeypatch):
+    repository = InMemoryAccountRepository()
+    repository.clear()
+    account = Account(name="cash", direction=Direction.DEBIT)
+    repository.add(account)
+    posted_at = datetime(2021, 1, 1, tzinfo=timezone.utc)
+    entry = AccountEntry(
+        account_id=account.id, direction=Direction.DEBIT, amount=10, posted_at=posted_at
+    )
+    repository.post_entry(entry)
+
+    # Fails once the entries file is written, half way through the ids file.
+    def failing_add(bloom, item):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(aledger.adapters.segments.BloomFilter, "add", failing_add)
+    with pytest.raises(OSError):
+        repository.close_period(datetime(2021, 2, 1, tzinfo=timezone.utc))
+
+    assert repository.closed_through is None
+    assert repository._segments == []
+    assert os.listdir(repository._segments_dir) == []
+    assert repository.get(account.id).entries == [entry]
+    repository.clear()
+
+
+def test_concurrent_close_period_should_keep_a_single_segment(monkeypatch):
+    repository = InMemoryAccountRepository()
+    repository.clear()
+    account = Account(name="cash", direction=Direction.DEBIT)
+    repository.add(account)
+    for day in range(1, 29):
+        posted_at = datetime(2021, 1, day, tzinfo=timezone.utc)
+        repository.post_entry(
+            AccountEntry(
+                account_id=account.id, direction=Direction.DEBIT, amount=1, posted_at=posted_at
+            )
+        )
+
+    # Slows segment writes down, so that closes overlap.
+    write = ColdSegment.write.__func__  # type: ignore
+
+    def slow_write(cls, *args, **kwargs):
+        time.sleep(0.01)
+        return write(cls, *args, **kwargs)
+
+    monkeypatch.setattr(ColdSegment, "write", classmethod(slow_write))
+
+    errors = []
+    barrier = threading.Barrier(8)
+
+    def close(day):
+        barrier.wait()
+        try:
+            repository.close_period(datetime(2021, 1, day, tzinfo=timezone.utc))
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=close, args=(day,)) for day in range(2, 26, 3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(repository._segments) == 1
+    assert len(os.listdir(repository._segments_dir)) == len(SUFFIXES)
+    assert len(list(repository.iter_entries(account.id))) == 28
+    assert repository.get(account.id).balance == 28
+    repository.clear()
+
+
+def test_close_period_should_move_transactions_to_cold_segments_and_keep_journal():
+    accounts = InMemoryAccountRepository()
+    accounts.clear()
+    transactions = InMemoryTransactionRepository()
+    transactions.clear()
+    cash = Account(name="cash", direction=Direction.DEBIT)
+    revenue = Account(name="revenue", direction=Direction.CREDIT)
+    accounts.add(cash)
+    accounts.add(revenue)
+
+    posted = []
+    for month in range(1, 5):
+        posted_at = datetime(2021, month, 1, tzinfo=timezone.utc)
+        txn = Transaction(
+            id=uuid.uuid4(),
+            name=f"sale {month}",
+            posted_at=posted_at,
+            entries=[
+                AccountEntry(
+                    account_id=cash.id, direction=Direction.DEBIT, amount=month, posted_at=posted_at
+                ),
+                AccountEntry(
+                    account_id=revenue.id,
+                    direction=Direction.CREDIT,
+                    amount=month,
+                    posted_at=posted_at,
+                ),
+            ],
+        )
+        for entry in txn.entries:
+            accounts.post_entry(entry)
+        transactions.add(txn)
+        posted.append(txn)
+
+    assert accounts.close_period(datetime(2021, 2, 15, tzinfo=timezone.utc), transactions) == 4
+    assert accounts.close_period(datetime(2021, 3, 15, tzinfo=timezone.utc), transactions) == 2
+
+    # Closed transactions leave memory, their ids stay claimed.
+    assert list(transactions.snapshot()) == posted[3:]
+    assert transactions.exists(posted[0].id)
+
+    # The journal and the account history read closed periods from the cold segment.
+    assert list(accounts.journal(transactions)) == posted
+    history = [entry.amount for entry in accounts.iter_entries(cash.id)]
+    assert history == [1, 2, 3, 4]
+    assert [entry.amount for entry in accounts.iter_entries(cash.id, start=2)] == [3, 4]
+    accounts.clear()
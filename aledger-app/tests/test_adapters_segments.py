@@ -0,0 +1,13 @@
+import uuid
+from aledger.adapters.segments import BloomFilter
+
+
+def test_bloom_filter_should_have_no_false_negatives_and_few_false_positives():
+    items = [uuid.uuid4() for _ in range(2000)]
+    bloom = BloomFilter(len(items))
+    for item in items:
+        bloom.add(item)
+
+    assert all(item in bloom for item in items)
+    false_positives = len([item for item in (uuid.uuid4() for _ in range(2000)) if item in bloom])
+    assert false_positives < 2000 * 0.05
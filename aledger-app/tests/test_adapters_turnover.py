@@ -0,0 +1,72 @@
+import random
+import uuid
+from datetime import datetime, timezone
+from aledger.adapters.turnover import FenwickTree, TurnoverIndex, bucket_index
+from aledger.domain import AccountEntry, Direction, TurnoverBucket
+
+
+def test_fenwick_tree_range_sums_should_match_naive_sums():
+    values = [random.randint(0, 1000) for _ in range(300)]
+    tree = FenwickTree(size=4)
+    for index, value in enumerate(values):
+        tree.add(index, value)
+
+    for _ in range(100):
+        start = random.randint(0, len(values))
+        end = random.randint(start, len(values) + 10)
+        assert tree.range_sum(start, end) == sum(values[start:end])
+
+
+def test_fenwick_tree_insert_should_shift_later_buckets():
+    tree = FenwickTree(size=2)
+    tree.add(0, 10)
+    tree.add(1, 20)
+
+    tree.insert(1)
+    tree.add(1, 5)
+
+    assert tree.range_sum(0, 1) == 10
+    assert tree.range_sum(1, 2) == 5
+    assert tree.range_sum(2, 3) == 20
+    assert tree.prefix_sum(len(tree)) == 35
+
+
+def test_turnover_index_should_only_store_buckets_with_postings():
+    account_id = uuid.uuid4()
+    index = TurnoverIndex()
+    for year, amount in [(2022, 10), (1000, 20), (9000, 30), (2022, 40)]:
+        posted_at = datetime(year, 1, 1, tzinfo=timezone.utc)
+        index.add(
+            AccountEntry(
+                account_id=account_id, direction=Direction.DEBIT, amount=amount, posted_at=posted_at
+            )
+        )
+
+    # One bucket per distinct year and bucket size, regardless of the span between them.
+    assert index.bucket_count() == 3 * len(TurnoverBucket)
+    for bucket in TurnoverBucket:
+        start = bucket_index(datetime(2022, 1, 1, tzinfo=timezone.utc), bucket)
+        assert index.sum(bucket, Direction.DEBIT, start, start + 1) == 50
+        assert index.sum(bucket, Direction.DEBIT, -(10 ** 9), start) == 20
+        assert index.sum(bucket, Direction.DEBIT, start + 1, 10 ** 9) == 30
+        assert index.sum(bucket, Direction.CREDIT, 0, 10 ** 9) == 0
+
+
+def test_turnover_index_report_should_cover_every_bucket_in_range():
+    account_id = uuid.uuid4()
+    index = TurnoverIndex()
+    for day, direction, amount in [
+        (2, Direction.DEBIT, 10),
+        (2, Direction.CREDIT, 5),
+        (4, Direction.DEBIT, 7),
+    ]:
+        posted_at = datetime(2022, 1, day, tzinfo=timezone.utc)
+        index.add(
+            AccountEntry(
+                account_id=account_id, direction=direction, amount=amount, posted_at=posted_at
+            )
+        )
+
+    start = bucket_index(datetime(2022, 1, 1, tzinfo=timezone.utc), TurnoverBucket.DAY)
+    report = index.report(TurnoverBucket.DAY, start, start + 5)
+    assert report == [(0, 0), (10, 5), (0, 0), (7, 0), (0, 0)]
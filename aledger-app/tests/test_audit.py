@@ -0,0 +1,242 @@
+import uuid
+import pytest
+from aledger.adapters import InMemoryAccountRepository, InMemoryTransactionRepository
+from aledger.audit import VERIFIED, Auditor, DiscrepancyKind
+from aledger.domain import Account, AccountEntry, Direction, Transaction, utcnow
+from aledger.exceptions import AccountEntryAlreadyExists, TransactionAlreadyExists
+
+
+@pytest.fixture
+def accounts():
+    repository = InMemoryAccountRepository()
+    repository.clear()
+    return repository
+
+
+@pytest.fixture
+def transactions():
+    repository = InMemoryTransactionRepository()
+    repository.clear()
+    return repository
+
+
+@pytest.fixture
+def auditor(accounts, transactions):
+    return Auditor(accounts, transactions)
+
+
+def post(accounts, transactions, debit: Account, credit: Account, amount: int) -> Transaction:
+    posted_at = utcnow()
+    txn = Transaction(
+        id=uuid.uuid4(),
+        name="purchase",
+        posted_at=posted_at,
+        entries=[
+            AccountEntry(
+                account_id=debit.id, direction=Direction.DEBIT, amount=amount, posted_at=posted_at
+            ),
+            AccountEntry(
+                account_id=credit.id,
+                direction=Direction.CREDIT,
+                amount=amount,
+                posted_at=posted_at,
+            ),
+        ],
+    )
+    for entry in txn.entries:
+        accounts.post_entry(entry)
+    transactions.add(txn)
+    return txn
+
+
+@pytest.fixture
+def cash(accounts):
+    account = Account(name="cash", direction=Direction.DEBIT)
+    accounts.add(account)
+    return account
+
+
+@pytest.fixture
+def revenue(accounts):
+    account = Account(name="revenue", direction=Direction.CREDIT)
+    accounts.add(account)
+    return account
+
+
+def test_audit_pass_over_consistent_ledger_should_find_no_discrepancies(
+    auditor, accounts, transactions, cash, revenue
+):
+    for amount in range(1, 11):
+        post(accounts, transactions, cash, revenue, amount)
+
+    assert auditor.run_slice(1)
+    status = auditor.status()
+    assert status.passes == 1
+    assert status.discrepancies == []
+    assert status.lag_seconds is not None
+
+
+def test_audit_should_only_verify_entries_appended_since_last_pass(
+    auditor, accounts, transactions, cash, revenue
+):
+    for amount in range(1, 11):
+        post(accounts, transactions, cash, revenue, amount)
+    assert auditor.run_slice(1)
+
+    post(accounts, transactions, cash, revenue, 5)
+    verified = VERIFIED.get(record="entry")
+    assert auditor.run_slice(1)
+    assert VERIFIED.get(record="entry") - verified == 2
+
+    # An update replaces the account record, so all of its entries are verified again.
+    accounts.update(accounts.get(cash.id))
+    verified = VERIFIED.get(record="entry")
+    assert auditor.run_slice(1)
+    assert VERIFIED.get(record="entry") - verified == 11
+    assert auditor.status().discrepancies == []
+
+
+def test_audit_should_work_in_slices(auditor, accounts, transactions, cash, revenue):
+    for _ in range(Auditor.CHUNK * 3):
+        post(accounts, transactions, cash, revenue, 1)
+
+    slices = 1
+    while not auditor.run_slice(0):
+        slices += 1
+    assert slices > 3
+    assert auditor.status().passes == 1
+
+
+def test_audit_should_report_balance_mismatch_once(auditor, accounts, transactions, cash, revenue):
+    post(accounts, transactions, cash, revenue, 10)
+    accounts._data[cash.id].slots[0] += 1
+
+    assert auditor.run_slice(1)
+    assert auditor.run_slice(1)
+    discrepancies = auditor.status().discrepancies
+    assert [(d.kind, d.subject_id) for d in discrepancies] == [
+        (DiscrepancyKind.BALANCE_MISMATCH, cash.id)
+    ]
+    assert discrepancies[0].detail == "balance is 11, entries add up to 10"
+
+
+def test_audit_should_report_unbalanced_transactions_and_unindexed_entries(
+    auditor, accounts, transactions, cash, revenue
+):
+    entry = AccountEntry(account_id=revenue.id, direction=Direction.CREDIT, amount=7)
+    accounts._data[cash.id].apply_entry(entry)
+    txn = Transaction.construct(id=uuid.uuid4(), name="broken", entries=[entry])
+    transactions.add(txn)
+
+    assert auditor.run_slice(1)
+    discrepancies = {(d.kind, d.subject_id) for d in auditor.status().discrepancies}
+    assert discrepancies == {
+        (DiscrepancyKind.UNBALANCED_TRANSACTION, txn.id),
+        (DiscrepancyKind.MISPLACED_ENTRY, entry.id),
+        (DiscrepancyKind.UNINDEXED_ENTRY, entry.id),
+        (DiscrepancyKind.UNBALANCED_LEDGER, None),
+    }
+
+
+def test_audit_should_report_entries_applied_by_failed_postings(
+    auditor, accounts, transactions, cash, revenue, monkeypatch
+):
+    monkeypatch.setattr(Auditor, "POSTING_GRACE", 0)
+    txn = post(accounts, transactions, cash, revenue, 3)
+
+    # A repeated transaction id is only refused once the entries were applied.
+    repeated = Transaction(
+        id=txn.id,
+        name="purchase",
+        entries=[
+            AccountEntry(account_id=cash.id, direction=Direction.DEBIT, amount=9),
+            AccountEntry(account_id=revenue.id, direction=Direction.CREDIT, amount=9),
+        ],
+    )
+    for entry in repeated.entries:
+        accounts.post_entry(entry)
+    with pytest.raises(TransactionAlreadyExists):
+        transactions.add(repeated)
+
+    # So is an entry id repeated within the transaction, once the first one was applied.
+    debit = AccountEntry(account_id=cash.id, direction=Direction.DEBIT, amount=9)
+    credit = AccountEntry(id=debit.id, account_id=revenue.id, direction=Direction.CREDIT, amount=9)
+    accounts.post_entry(debit)
+    with pytest.raises(AccountEntryAlreadyExists):
+        accounts.post_entry(credit)
+
+    # Entries may be filed before their transaction is stored, so they get another pass.
+    assert auditor.run_slice(1)
+    assert auditor.status().discrepancies == []
+    assert auditor.run_slice(1)
+    assert auditor.run_slice(1)
+
+    assert accounts.get(cash.id).balance == 21
+    assert accounts.get(revenue.id).balance == 12
+    discrepancies = auditor.status().discrepancies
+    assert sorted([(d.kind.value, d.subject_id) for d in discrepancies], key=str) == sorted(
+        [
+            (DiscrepancyKind.UNPOSTED_ENTRY.value, repeated.entries[0].id),
+            (DiscrepancyKind.UNPOSTED_ENTRY.value, repeated.entries[1].id),
+            (DiscrepancyKind.UNPOSTED_ENTRY.value, debit.id),
+            (DiscrepancyKind.UNBALANCED_LEDGER.value, None),
+        ],
+        key=str,
+    )
+    assert discrepancies[-1].detail == "debits add up to 21, credits to 12"
+
+
+def test_audit_should_report_entries_filed_under_no_account(
+    auditor, accounts, transactions, cash, revenue
+):
+    txn = Transaction(
+        id=uuid.uuid4(),
+        name="purchase",
+        entries=[
+            AccountEntry(account_id=cash.id, direction=Direction.DEBIT, amount=5),
+            AccountEntry(account_id=revenue.id, direction=Direction.CREDIT, amount=5),
+        ],
+    )
+    transactions.add(txn)
+
+    assert auditor.run_slice(1)
+    assert auditor.run_slice(1)
+    discrepancies = {(d.kind, d.subject_id) for d in auditor.status().discrepancies}
+    assert discrepancies == {(DiscrepancyKind.UNFILED_ENTRY, entry.id) for entry in txn.entries}
+
+
+def test_audit_should_report_indexed_entry_ids_of_no_entry_once(
+    auditor, accounts, transactions, cash, revenue
+):
+    post(accounts, transactions, cash, revenue, 5)
+    stale_id = uuid.uuid4()
+    accounts._entry_ids.add(stale_id)
+
+    # Entry ids are indexed before their entries are filed, so a surplus must last a pass.
+    assert auditor.run_slice(1)
+    assert auditor.status().discrepancies == []
+    assert auditor.run_slice(1)
+    assert auditor.run_slice(1)
+    discrepancies = [(d.kind, d.subject_id) for d in auditor.status().discrepancies]
+    assert discrepancies == [(DiscrepancyKind.STALE_ENTRY_ID, stale_id)]
+
+
+def test_audit_should_verify_again_once_transactions_are_closed(
+    auditor, accounts, transactions, cash, revenue
+):
+    for amount in range(1, 11):
+        post(accounts, transactions, cash, revenue, amount)
+    assert auditor.run_slice(1)
+
+    # Closing moves transactions out of memory, which shifts the positions of the others.
+    cutoff = transactions.window(5, 6)[0].posted_at
+    accounts.close_period(cutoff, transactions)
+    post(accounts, transactions, cash, revenue, 11)
+
+    verified = VERIFIED.get(record="transaction")
+    assert auditor.run_slice(1)
+    assert len(transactions) < 11
+    assert VERIFIED.get(record="transaction") - verified == len(transactions)
+    assert auditor.run_slice(1)
+    assert auditor.status().discrepancies == []
+    accounts.clear()
@@ -0,0 +1,91 @@
+import asyncio
+import pytest
+from fastapi.testclient import TestClient
+from aledger.controllers.admission import AdmissionGate, Rejected, WRITE_GATE
+from aledger.controllers.http import app
+
+
+client = TestClient(app)
+
+
+def test_gate_should_serve_waiting_requests_by_priority_then_arrival():
+    async def scenario():
+        gate = AdmissionGate("test", concurrency=1, queue_depth=10, queue_timeout=5)
+        served = []
+
+        async def request(name, priority):
+            await gate.acquire(priority)
+            served.append(name)
+            await asyncio.sleep(0)
+            gate.release()
+
+        await gate.acquire()
+        waiting = [
+            asyncio.create_task(request("large-1", 1)),
+            asyncio.create_task(request("small-1", 0)),
+            asyncio.create_task(request("large-2", 1)),
+            asyncio.create_task(request("small-2", 0)),
+        ]
+        await asyncio.sleep(0)
+        assert gate.queued == 4
+
+        gate.release()
+        await asyncio.gather(*waiting)
+        assert served == ["small-1", "small-2", "large-1", "large-2"]
+        assert gate.in_flight == 0
+        assert gate.queued == 0
+
+    asyncio.run(scenario())
+
+
+def test_gate_should_reject_requests_beyond_queue_depth():
+    async def scenario():
+        gate = AdmissionGate("test", concurrency=1, queue_depth=1, queue_timeout=5)
+        await gate.acquire()
+        waiting = asyncio.create_task(gate.acquire())
+        await asyncio.sleep(0)
+
+        with pytest.raises(Rejected) as rejection:
+            await gate.acquire()
+        assert rejection.value.status_code == 429
+
+        gate.release()
+        await waiting
+        assert gate.in_flight == 1
+
+    asyncio.run(scenario())
+
+
+def test_gate_should_reject_requests_waiting_beyond_queue_timeout():
+    async def scenario():
+        gate = AdmissionGate("test", concurrency=1, queue_depth=1, queue_timeout=0.01)
+        await gate.acquire()
+
+        with pytest.raises(Rejected) as rejection:
+            await gate.acquire()
+        assert rejection.value.status_code == 503
+        assert rejection.value.retry_after == 1
+        assert gate.queued == 0
+
+        # The expired request must not take the turn of the next one.
+        gate.release()
+        assert gate.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_overloaded_write_gate_should_shed_postings_but_not_reads(monkeypatch):
+    monkeypatch.setattr(WRITE_GATE, "concurrency", 0)
+    monkeypatch.setattr(WRITE_GATE, "queue_depth", 0)
+
+    response = client.post("/account", json={"name": "cash", "direction": "debit"})
+    assert response.status_code == 429
+    assert response.headers["retry-after"] == "1"
+    assert response.json() == {"error": "error.overloaded", "detail": "queue_full"}
+
+    response = client.get("/account/a4b6a0b2-3c3c-4a0e-9f0a-3f1d8d0b6a11")
+    assert response.status_code == 404
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert 'aledger_admission_rejected_total{gate="write",reason="queue_full"}' in response.text
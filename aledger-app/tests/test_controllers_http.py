@@ -1,8 +1,20 @@
+import csv
+import io
+import time
 import uuid
+from datetime import datetime
+import msgpack  # type: ignore
 import pytest
+from fastapi import Request
 from fastapi.testclient import TestClient
+from pydantic import SecretStr
+import aledger.adapters.export
 from aledger.adapters import ACCOUNTS_REPOSITORY, TRANSACTIONS_REPOSITORY
-from aledger.controllers.http import app
+from aledger.audit import AUDITOR
+from aledger.controllers import codecs
+from aledger.controllers.http import app, negotiate
+from aledger.profiling import PROFILER, ProfilerSettings
+from aledger.settings import SETTINGS
 
 
 client = TestClient(app)
@@ -14,6 +26,17 @@ def clean_data_at_setup():
     TRANSACTIONS_REPOSITORY.clear()
 
 
+ADMIN_HEADERS = {"x-admin-token": "s3cr3t"}
+
+
+@pytest.fixture
+def admin_token(monkeypatch):
+    monkeypatch.setattr(SETTINGS, "admin_token", SecretStr(ADMIN_HEADERS["x-admin-token"]))
+    yield
+    PROFILER.configure(ProfilerSettings())
+    PROFILER.reset()
+
+
 # --------------------------------------------------------------------------------------
 # Test /accounts endpoints
 # --------------------------------------------------------------------------------------
@@ -180,21 +203,25 @@ def test_post_transaction_with_two_legs_should_update_account_balances(
     body = {"id": str(uuid.uuid4()), "entries": [entry_1, entry_2]}
     response = client.post("/transaction", json=body)
     assert response.status_code == 200
+    posted_at = response.json()["posted_at"]
     assert response.json() == {
         "id": body["id"],
         "name": "txn",
+        "posted_at": posted_at,
         "entries": [
             {
                 "id": entry_1["id"],
                 "account_id": entry_1["account_id"],
                 "direction": "debit",
                 "amount": 15000,
+                "posted_at": posted_at,
             },
             {
                 "id": entry_2["id"],
                 "account_id": entry_2["account_id"],
                 "direction": "credit",
                 "amount": 15000,
+                "posted_at": posted_at,
             },
         ],
     }
@@ -243,27 +270,32 @@ def test_post_transaction_with_three_legs_should_update_account_balances(
     }
     response = client.post("/transaction", json=body)
     assert response.status_code == 200
+    posted_at = response.json()["posted_at"]
     assert response.json() == {
         "id": body["id"],
         "name": "my-transaction",
+        "posted_at": posted_at,
         "entries": [
             {
                 "id": entry_1["id"],
                 "account_id": entry_1["account_id"],
                 "direction": "debit",
                 "amount": 250000,
+                "posted_at": posted_at,
             },
             {
                 "id": entry_2["id"],
                 "account_id": entry_2["account_id"],
                 "direction": "debit",
                 "amount": 50000,
+                "posted_at": posted_at,
             },
             {
                 "id": entry_3["id"],
                 "account_id": entry_3["account_id"],
                 "direction": "credit",
                 "amount": 300000,
+                "posted_at": posted_at,
             },
         ],
     }
@@ -349,6 +381,10 @@ def test_post_transaction_with_repeated_transaction_id_should_error_out(
     response = client.post("/transaction", json=body)
     assert response.status_code == 400
 
+    # Verify no entry of the rejected transaction was posted.
+    response = client.get(f"/account/{furniture_acc_id}")
+    assert response.json()["balance"] == 15000
+
 
 def test_post_transaction_with_repeated_entry_id_should_error_out(furniture_acc, petty_cash_acc):
     furniture_acc_id = furniture_acc["id"]
@@ -373,6 +409,10 @@ def test_post_transaction_with_repeated_entry_id_should_error_out(furniture_acc,
     response = client.post("/transaction", json=body)
     assert response.status_code == 400
 
+    # Verify no entry of the rejected transaction was posted.
+    response = client.get(f"/account/{furniture_acc_id}")
+    assert response.json()["balance"] == 0
+
 
 def test_post_transaction_with_repeated_entry_id_from_prior_transaction_should_error_out(
     furniture_acc, petty_cash_acc
@@ -413,3 +453,535 @@ def test_post_transaction_with_repeated_entry_id_from_prior_transaction_should_e
     body = {"entries": [entry_1, entry_2]}
     response = client.post("/transaction", json=body)
     assert response.status_code == 400
+
+    # Post a transaction whose last entry re-uses an id from a prior transaction.
+    body = {"entries": [{**entry_1, "id": str(uuid.uuid4())}, {**entry_2, "id": entry_1["id"]}]}
+    response = client.post("/transaction", json=body)
+    assert response.status_code == 400
+
+    # Verify no entry of the rejected transactions was posted.
+    response = client.get(f"/account/{furniture_acc_id}")
+    assert response.json()["balance"] == 10
+
+
+def test_post_transaction_should_ignore_client_posting_time(furniture_acc, petty_cash_acc):
+    entry_1 = {"account_id": furniture_acc["id"], "amount": 10, "direction": "debit"}
+    entry_2 = {"account_id": petty_cash_acc["id"], "amount": 10, "direction": "credit"}
+    body = {"posted_at": "2000-01-01T00:00:00+00:00", "entries": [entry_1, entry_2]}
+    response = client.post("/transaction", json=body)
+    assert response.status_code == 200
+    posted_at = datetime.fromisoformat(response.json()["posted_at"])
+    assert posted_at.year > 2000
+    assert [entry["posted_at"] for entry in response.json()["entries"]] == [
+        response.json()["posted_at"]
+    ] * 2
+
+
+def test_post_backdated_transaction_should_keep_posting_time(
+    admin_token, furniture_acc, petty_cash_acc
+):
+    entry_1 = {"account_id": furniture_acc["id"], "amount": 10, "direction": "debit"}
+    entry_2 = {"account_id": petty_cash_acc["id"], "amount": 10, "direction": "credit"}
+    body = {"posted_at": "2000-01-01T00:00:00+00:00", "entries": [entry_1, entry_2]}
+
+    # Backdating requires an admin token.
+    response = client.post("/admin/transaction", json=body)
+    assert response.status_code == 403
+
+    response = client.post("/admin/transaction", json=body, headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    assert response.json()["posted_at"] == "2000-01-01T00:00:00+00:00"
+
+
+def test_post_backdated_transaction_dated_in_future_should_error_out(
+    admin_token, furniture_acc, petty_cash_acc
+):
+    entry_1 = {"account_id": furniture_acc["id"], "amount": 10, "direction": "debit"}
+    entry_2 = {"account_id": petty_cash_acc["id"], "amount": 10, "direction": "credit"}
+    body = {"posted_at": "2999-01-01T00:00:00+00:00", "entries": [entry_1, entry_2]}
+    response = client.post("/admin/transaction", json=body, headers=ADMIN_HEADERS)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "transaction is dated in the future"
+
+
+# --------------------------------------------------------------------------------------
+# Test /admin/account/{account_id}/slots endpoints
+# --------------------------------------------------------------------------------------
+
+
+def test_configure_account_slots_should_preserve_account_balance(
+    admin_token, furniture_acc, petty_cash_acc
+):
+    furniture_acc_id = furniture_acc["id"]
+    petty_cash_acc_id = petty_cash_acc["id"]
+
+    # Marking an account as hot requires an admin token.
+    response = client.put(f"/admin/account/{petty_cash_acc_id}/slots", json={"slots": 4})
+    assert response.status_code == 403
+
+    # Mark the petty cash account as hot.
+    response = client.put(
+        f"/admin/account/{petty_cash_acc_id}/slots", json={"slots": 4}, headers=ADMIN_HEADERS
+    )
+    assert response.status_code == 200
+    assert response.json()["balance"] == 0
+
+    # Post purchases spread across the petty cash slots.
+    for amount in [10, 20, 30, 40, 50]:
+        entry_1 = {"account_id": furniture_acc_id, "amount": amount, "direction": "debit"}
+        entry_2 = {"account_id": petty_cash_acc_id, "amount": amount, "direction": "credit"}
+        response = client.post("/transaction", json={"entries": [entry_1, entry_2]})
+        assert response.status_code == 200
+
+    # Verify the balance aggregates every slot.
+    response = client.get(f"/account/{petty_cash_acc_id}")
+    assert response.status_code == 200
+    assert response.json()["balance"] == -150
+
+    # Shrink the slots back and verify the balance is unchanged.
+    response = client.put(
+        f"/admin/account/{petty_cash_acc_id}/slots", json={"slots": 1}, headers=ADMIN_HEADERS
+    )
+    assert response.status_code == 200
+    assert response.json()["balance"] == -150
+
+    response = client.get(f"/account/{petty_cash_acc_id}")
+    assert response.json()["balance"] == -150
+
+
+def test_configure_account_slots_with_invalid_count_should_error_out(admin_token, petty_cash_acc):
+    response = client.put(
+        f"/admin/account/{petty_cash_acc['id']}/slots", json={"slots": 0}, headers=ADMIN_HEADERS
+    )
+    assert response.status_code == 400
+
+
+def test_configure_account_slots_with_unknown_account_id_should_error_out(admin_token):
+    response = client.put(
+        f"/admin/account/{uuid.uuid4()}/slots", json={"slots": 2}, headers=ADMIN_HEADERS
+    )
+    assert response.status_code == 404
+
+
+# --------------------------------------------------------------------------------------
+# Test /account/{account_id}/turnover endpoints
+# --------------------------------------------------------------------------------------
+
+
+def post_purchase(furniture_acc_id, petty_cash_acc_id, amount, posted_at):
+    entry_1 = {"account_id": furniture_acc_id, "amount": amount, "direction": "debit"}
+    entry_2 = {"account_id": petty_cash_acc_id, "amount": amount, "direction": "credit"}
+    body = {"posted_at": posted_at, "entries": [entry_1, entry_2]}
+    response = client.post("/admin/transaction", json=body, headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+
+
+def test_retrieve_turnover_should_aggregate_entries_per_bucket(
+    admin_token, furniture_acc, petty_cash_acc
+):
+    furniture_acc_id = furniture_acc["id"]
+    petty_cash_acc_id = petty_cash_acc["id"]
+
+    # Post purchases across a few days, out of order.
+    post_purchase(furniture_acc_id, petty_cash_acc_id, 300, "2022-01-03T10:00:00+00:00")
+    post_purchase(furniture_acc_id, petty_cash_acc_id, 100, "2022-01-01T10:00:00+00:00")
+    post_purchase(furniture_acc_id, petty_cash_acc_id, 200, "2022-01-01T23:59:59+00:00")
+    post_purchase(furniture_acc_id, petty_cash_acc_id, 900, "2021-12-31T23:00:00+00:00")
+
+    # Retrieve daily turnover for the first three days of the year.
+    params = {"from": "2022-01-01T00:00:00Z", "to": "2022-01-03T12:00:00Z", "bucket": "day"}
+    response = client.get(f"/account/{furniture_acc_id}/turnover", params=params)
+    assert response.status_code == 200
+    assert response.json() == {
+        "account_id": furniture_acc_id,
+        "bucket": "day",
+        "start": "2022-01-01T00:00:00+00:00",
+        "end": "2022-01-04T00:00:00+00:00",
+        "debit": 600,
+        "credit": 0,
+        "buckets": [
+            {"start": "2022-01-01T00:00:00+00:00", "debit": 300, "credit": 0},
+            {"start": "2022-01-02T00:00:00+00:00", "debit": 0, "credit": 0},
+            {"start": "2022-01-03T00:00:00+00:00", "debit": 300, "credit": 0},
+        ],
+    }
+
+    # Retrieve monthly turnover on the opposite side of the transactions.
+    params = {"from": "2021-12-01T00:00:00Z", "to": "2022-01-31T00:00:00Z", "bucket": "month"}
+    response = client.get(f"/account/{petty_cash_acc_id}/turnover", params=params)
+    assert response.status_code == 200
+    assert response.json()["credit"] == 1500
+    assert response.json()["buckets"] == [
+        {"start": "2021-12-01T00:00:00+00:00", "debit": 0, "credit": 900},
+        {"start": "2022-01-01T00:00:00+00:00", "debit": 0, "credit": 600},
+    ]
+
+    # Retrieve hourly turnover for a single hour.
+    params = {"from": "2022-01-01T10:15:00Z", "to": "2022-01-01T10:45:00Z", "bucket": "hour"}
+    response = client.get(f"/account/{furniture_acc_id}/turnover", params=params)
+    assert response.status_code == 200
+    assert response.json()["debit"] == 100
+    assert len(response.json()["buckets"]) == 1
+
+
+def test_retrieve_turnover_with_reversed_range_should_error_out(furniture_acc):
+    params = {"from": "2022-01-02T00:00:00Z", "to": "2022-01-01T00:00:00Z"}
+    response = client.get(f"/account/{furniture_acc['id']}/turnover", params=params)
+    assert response.status_code == 400
+
+
+def test_retrieve_turnover_with_too_many_buckets_should_error_out(furniture_acc):
+    params = {"from": "2017-01-01T00:00:00Z", "to": "2022-01-01T00:00:00Z", "bucket": "hour"}
+    response = client.get(f"/account/{furniture_acc['id']}/turnover", params=params)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "turnover range spans more than 1000 buckets"
+
+
+@pytest.mark.parametrize("bucket", ["day", "month"])
+def test_retrieve_turnover_up_to_the_last_representable_bucket(furniture_acc, bucket):
+    params = {"from": "9999-12-01T00:00:00Z", "to": "9999-12-31T00:00:00Z", "bucket": bucket}
+    response = client.get(f"/account/{furniture_acc['id']}/turnover", params=params)
+    assert response.status_code == 200
+    assert response.json()["end"] == "9999-12-31T23:59:59.999999+00:00"
+
+
+def test_retrieve_turnover_with_unknown_account_id_should_error_out():
+    params = {"from": "2022-01-01T00:00:00Z", "to": "2022-01-02T00:00:00Z"}
+    response = client.get(f"/account/{uuid.uuid4()}/turnover", params=params)
+    assert response.status_code == 404
+
+
+# --------------------------------------------------------------------------------------
+# Test MessagePack content negotiation
+# --------------------------------------------------------------------------------------
+
+MSGPACK_HEADERS = {"content-type": "application/msgpack", "accept": "application/msgpack"}
+
+
+def test_register_account_with_msgpack_body_should_respond_with_msgpack():
+    id = uuid.uuid4()
+
+    # Registers Account.
+    body = msgpack.packb({"id": id.bytes, "name": "cash", "direction": 1})
+    response = client.post("/account", data=body, headers=MSGPACK_HEADERS)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(response.content) == {
+        "id": id.bytes,
+        "name": "cash",
+        "direction": 1,
+        "balance": 0,
+    }
+
+    # Retrieves Account as JSON.
+    response = client.get(f"/account/{id}")
+    assert response.status_code == 200
+    assert response.json()["direction"] == "debit"
+
+
+def test_post_transaction_with_msgpack_body_should_respond_with_msgpack(
+    furniture_acc, petty_cash_acc
+):
+    furniture_acc_id = uuid.UUID(furniture_acc["id"])
+    petty_cash_acc_id = uuid.UUID(petty_cash_acc["id"])
+
+    # Post a transaction: use petty cash to buy furniture.
+    entry_1 = {"account_id": furniture_acc_id.bytes, "amount": 15000, "direction": 1}
+    entry_2 = {"account_id": petty_cash_acc_id.bytes, "amount": 15000, "direction": 0}
+    body = {"id": uuid.uuid4().bytes, "entries": [entry_1, entry_2]}
+    data = msgpack.packb(body, datetime=True)
+    response = client.post("/transaction", data=data, headers=MSGPACK_HEADERS)
+    assert response.status_code == 200
+    transaction = msgpack.unpackb(response.content, timestamp=3)
+    assert transaction["id"] == body["id"]
+    assert isinstance(transaction["posted_at"], datetime)
+    assert [(entry["account_id"], entry["direction"]) for entry in transaction["entries"]] == [
+        (furniture_acc_id.bytes, 1),
+        (petty_cash_acc_id.bytes, 0),
+    ]
+
+    # Verify petty-cash balance decreased.
+    response = client.get(f"/account/{petty_cash_acc_id}", headers=MSGPACK_HEADERS)
+    assert response.status_code == 200
+    assert msgpack.unpackb(response.content)["balance"] == -15000
+
+
+def test_post_transaction_with_invalid_msgpack_body_should_error_out_with_msgpack():
+    body = msgpack.packb({"entries": [{"amount": 100, "direction": 1}]})
+    response = client.post("/transaction", data=body, headers=MSGPACK_HEADERS)
+    assert response.status_code == 400
+    assert response.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(response.content)["error"] == "error.field_validation_failure"
+
+    # Retrieves an unknown Account.
+    response = client.get(f"/account/{uuid.uuid4()}", headers=MSGPACK_HEADERS)
+    assert response.status_code == 404
+    assert msgpack.unpackb(response.content) == {
+        "error": "error.generic_error",
+        "detail": "Not Found",
+    }
+
+
+def test_post_transaction_with_amount_beyond_64_bits_should_error_out(
+    furniture_acc, petty_cash_acc
+):
+    entries = [
+        {"account_id": furniture_acc["id"], "amount": 2 ** 70, "direction": "debit"},
+        {"account_id": petty_cash_acc["id"], "amount": 2 ** 70, "direction": "credit"},
+    ]
+    body = {"id": str(uuid.uuid4()), "entries": entries}
+    response = client.post("/transaction", json=body, headers={"accept": "application/msgpack"})
+    assert response.status_code == 400
+    assert msgpack.unpackb(response.content)["error"] == "error.field_validation_failure"
+
+
+def test_msgpack_response_with_integer_beyond_64_bits_should_fall_back_to_json():
+    request = Request({"type": "http", "headers": [(b"accept", b"application/msgpack")]})
+    response = negotiate(request, {"balance": 2 ** 70}, status_code=201)
+    assert response.media_type == "application/json"
+    assert response.body == b'{"balance":1180591620717411303424}'
+
+
+def test_msgpack_body_should_only_decode_uuid_fields_as_uuids():
+    id = uuid.uuid4()
+    assert codecs.unpack(codecs.pack({"id": id, "digest": id.bytes})) == {
+        "id": id,
+        "digest": id.bytes,
+    }
+
+
+def test_accept_header_should_rank_json_and_msgpack_by_quality(furniture_acc):
+    accept = "application/msgpack;q=0.5, application/json"
+    response = client.get(f"/account/{furniture_acc['id']}", headers={"accept": accept})
+    assert response.headers["content-type"] == "application/json"
+
+    accept = "application/json;q=0.5, application/msgpack"
+    response = client.get(f"/account/{furniture_acc['id']}", headers={"accept": accept})
+    assert response.headers["content-type"] == "application/msgpack"
+
+
+# --------------------------------------------------------------------------------------
+# Test /admin/period/close endpoints
+# --------------------------------------------------------------------------------------
+
+
+def test_close_period_should_carry_balances_forward(admin_token, furniture_acc, petty_cash_acc):
+    furniture_acc_id = furniture_acc["id"]
+    petty_cash_acc_id = petty_cash_acc["id"]
+    closed_entry_id = str(uuid.uuid4())
+
+    # Post purchases on both sides of the cutoff.
+    entry_1 = {
+        "id": closed_entry_id,
+        "account_id": furniture_acc_id,
+        "amount": 100,
+        "direction": "debit",
+    }
+    entry_2 = {"account_id": petty_cash_acc_id, "amount": 100, "direction": "credit"}
+    body = {"posted_at": "2021-12-31T10:00:00+00:00", "entries": [entry_1, entry_2]}
+    response = client.post("/admin/transaction", json=body, headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    post_purchase(furniture_acc_id, petty_cash_acc_id, 200, "2022-01-02T10:00:00+00:00")
+
+    # Closing a period requires an admin token.
+    response = client.post("/admin/period/close", json={"cutoff": "2022-01-01T00:00:00Z"})
+    assert response.status_code == 403
+
+    # Close the previous year.
+    body = {"cutoff": "2022-01-01T00:00:00Z"}
+    response = client.post("/admin/period/close", json=body, headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    assert response.json() == {"cutoff": "2022-01-01T00:00:00+00:00", "closed_entries": 2}
+
+    # Verify balances are carried forward.
+    response = client.get(f"/account/{furniture_acc_id}")
+    assert response.json()["balance"] == 300
+    response = client.get(f"/account/{petty_cash_acc_id}")
+    assert response.json()["balance"] == -300
+
+    # Verify turnover still covers the closed period.
+    params = {"from": "2021-12-01T00:00:00Z", "to": "2022-01-31T00:00:00Z", "bucket": "month"}
+    response = client.get(f"/account/{furniture_acc_id}/turnover", params=params)
+    assert response.json()["debit"] == 300
+
+    # Verify the account history still covers the closed period.
+    response = client.get(f"/account/{furniture_acc_id}/entries")
+    assert response.status_code == 200
+    assert [entry["amount"] for entry in response.json()] == [100, 200]
+    assert response.json()[0]["id"] == closed_entry_id
+    response = client.get(f"/account/{furniture_acc_id}/entries", params={"offset": 1})
+    assert [entry["amount"] for entry in response.json()] == [200]
+
+    # Verify the journal export still covers the closed period.
+    params = {"format": "csv"}
+    response = client.get("/admin/export/journal", params=params, headers=ADMIN_HEADERS)
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["amount"] for row in rows] == ["100", "100", "200", "200"]
+
+    # Post a transaction re-using an entry id from the closed period.
+    entry_1 = {
+        "id": closed_entry_id,
+        "account_id": furniture_acc_id,
+        "amount": 10,
+        "direction": "debit",
+    }
+    entry_2 = {"account_id": petty_cash_acc_id, "amount": 10, "direction": "credit"}
+    response = client.post("/transaction", json={"entries": [entry_1, entry_2]})
+    assert response.status_code == 400
+
+    # Post a transaction dated within the closed period.
+    entry_1 = {"account_id": furniture_acc_id, "amount": 10, "direction": "debit"}
+    entry_2 = {"account_id": petty_cash_acc_id, "amount": 10, "direction": "credit"}
+    body = {"posted_at": "2021-12-31T10:00:00+00:00", "entries": [entry_1, entry_2]}
+    response = client.post("/admin/transaction", json=body, headers=ADMIN_HEADERS)
+    assert response.status_code == 400
+    assert response.json()["detail"] == "transaction is dated within a closed period"
+
+
+def test_retrieve_account_entries_with_unknown_account_id_should_error_out():
+    response = client.get(f"/account/{uuid.uuid4()}/entries")
+    assert response.status_code == 404
+
+
+def test_close_period_with_future_cutoff_should_error_out(admin_token):
+    body = {"cutoff": "2999-01-01T00:00:00Z"}
+    response = client.post("/admin/period/close", json=body, headers=ADMIN_HEADERS)
+    assert response.status_code == 400
+
+
+# --------------------------------------------------------------------------------------
+# Test /admin/profiler endpoints
+# --------------------------------------------------------------------------------------
+
+
+def test_admin_endpoints_without_valid_token_should_error_out(admin_token):
+    response = client.get("/admin/profiler")
+    assert response.status_code == 403
+    response = client.get("/admin/profiler", headers={"x-admin-token": "guess"})
+    assert response.status_code == 403
+
+
+def test_profiler_should_capture_slow_calls_as_collapsed_stacks(
+    admin_token, monkeypatch, furniture_acc
+):
+    # Slow down account retrieval.
+    def slow_get(account_id, get=ACCOUNTS_REPOSITORY.get):
+        time.sleep(0.05)
+        return get(account_id)
+
+    monkeypatch.setattr(ACCOUNTS_REPOSITORY, "get", slow_get)
+
+    # Enable slow call capture.
+    settings = {"enabled": True, "sample_rate": 0, "slow_threshold_ms": 20, "interval_ms": 1}
+    response = client.put("/admin/profiler", json=settings, headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    assert response.json() == settings
+
+    response = client.get(f"/account/{furniture_acc['id']}")
+    assert response.status_code == 200
+
+    # Verify the slow call has been captured.
+    response = client.get("/admin/profiler/slow", headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    [slow_call] = response.json()
+    assert slow_call["name"] == "retrieve_account"
+    assert slow_call["tags"] == {"history": 0}
+    assert slow_call["duration_ms"] >= 20
+
+    response = client.get("/admin/profiler/stacks", headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    stacks = response.text.splitlines()
+    assert stacks
+    assert all(
+        stack.startswith("retrieve_account;history=0;aledger.service.queries:retrieve_account;")
+        for stack in stacks
+    )
+    assert any(":slow_get " in stack for stack in stacks)
+
+    # Reset the captured stacks.
+    response = client.delete("/admin/profiler/stacks", headers=ADMIN_HEADERS)
+    assert response.status_code == 204
+    response = client.get("/admin/profiler/stacks", headers=ADMIN_HEADERS)
+    assert response.text == ""
+
+
+# --------------------------------------------------------------------------------------
+# Test /admin/export endpoints
+# --------------------------------------------------------------------------------------
+
+
+def test_export_journal_as_csv_should_stream_every_entry(
+    admin_token, furniture_acc, petty_cash_acc
+):
+    furniture_acc_id = furniture_acc["id"]
+    petty_cash_acc_id = petty_cash_acc["id"]
+    for amount in [10, 20, 30]:
+        post_purchase(furniture_acc_id, petty_cash_acc_id, amount, "2022-01-01T10:00:00+00:00")
+
+    params = {"format": "csv", "batch_size": 4}
+    response = client.get("/admin/export/journal", params=params, headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 6
+    assert [(row["account_id"], row["direction"], row["amount"]) for row in rows[:2]] == [
+        (furniture_acc_id, "debit", "10"),
+        (petty_cash_acc_id, "credit", "10"),
+    ]
+    assert rows[0]["posted_at"] == "2022-01-01 10:00:00+00:00"
+
+
+@pytest.mark.parametrize("format", ["parquet", "arrow"])
+def test_export_journal_as_columnar_file_should_stream_every_entry(
+    admin_token, furniture_acc, petty_cash_acc, format
+):
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.parquet
+
+    for amount in [10, 20, 30]:
+        post_purchase(furniture_acc["id"], petty_cash_acc["id"], amount, "2022-01-01T10:00:00Z")
+
+    params = {"format": format, "batch_size": 4}
+    response = client.get("/admin/export/journal", params=params, headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    if format == "parquet":
+        table = pyarrow.parquet.read_table(io.BytesIO(response.content))
+    else:
+        table = pyarrow.ipc.open_stream(response.content).read_all()
+    assert table.num_rows == 6
+    assert table.column("amount").to_pylist() == [10, 10, 20, 20, 30, 30]
+
+
+def test_export_journal_without_columnar_support_should_fall_back_to_csv(admin_token, monkeypatch):
+    monkeypatch.setattr(aledger.adapters.export, "pyarrow", None)
+    params = {"format": "parquet"}
+    response = client.get("/admin/export/journal", params=params, headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    assert response.text.startswith("transaction_id,transaction_name,posted_at,")
+
+
+# --------------------------------------------------------------------------------------
+# Test /admin/audit endpoints
+# --------------------------------------------------------------------------------------
+
+
+def test_audit_status_should_report_discrepancies(admin_token, furniture_acc, petty_cash_acc):
+    post_purchase(furniture_acc["id"], petty_cash_acc["id"], 10, "2022-01-01T10:00:00Z")
+    account_id = uuid.UUID(furniture_acc["id"])
+    ACCOUNTS_REPOSITORY._data[account_id].slots[0] += 5
+
+    AUDITOR.reset()
+    assert AUDITOR.run_slice(1)
+    response = client.get("/admin/audit", headers=ADMIN_HEADERS)
+    assert response.status_code == 200
+    status = response.json()
+    assert status["passes"] == 1
+    assert status["lag_seconds"] >= 0
+    assert [(d["kind"], d["subject_id"]) for d in status["discrepancies"]] == [
+        ("balance_mismatch", furniture_acc["id"])
+    ]
+
+    response = client.get("/metrics")
+    assert 'aledger_audit_discrepancies_total{kind="balance_mismatch"}' in response.text
+    AUDITOR.reset()
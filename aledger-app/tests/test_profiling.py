@@ -0,0 +1,25 @@
+import time
+from aledger.profiling import ProfilerSettings, SamplingProfiler
+
+
+def test_nested_profiled_calls_should_be_sampled_within_the_outer_call():
+    profiler = SamplingProfiler()
+    profiler.configure(ProfilerSettings(enabled=True, sample_rate=1, interval_ms=1))
+
+    def inner():
+        time.sleep(0.02)
+        return 1
+
+    def outer():
+        return profiler.run("inner", lambda: {}, inner) + 1
+
+    try:
+        assert profiler.run("outer", lambda: {}, outer) == 2
+    finally:
+        profiler.configure(ProfilerSettings(enabled=False))
+
+    stacks = profiler.collapsed().splitlines()
+    assert stacks
+    assert all(stack.startswith("outer;") for stack in stacks)
+    assert any(":inner " in stack for stack in stacks)
+    assert profiler._active == {}